@@ -1,22 +1,25 @@
+import importlib
+import os
+import threading
+
 import dash
+import pandas as pd
 from dash import dcc, html
 from dash.dependencies import Input, Output
-from pages import (
-    overview,
-    aeCompensation,
-    insights,
-    quotaStrategy,
-    modelOverview,
-    dataExplorer,
-)
 import dash_bootstrap_components as dbc
-import pandas as pd
 import plotly.io as pio
 from components.header import Header
 from components.navigationBar import NavigationBar
-from compensation_model.calculations import calculate_compensation
+from compensation_model.dataset import DatasetStore
+from compensation_model.sharedDataset import load_dataset_snapshot
+from flask import abort, jsonify, request
 from pages.aeCompensation import register_callbacks
-from pages.dataExplorer import register_callbacks_data_explorer
+from pages.dataExplorer import (
+    register_callbacks_data_explorer,
+    register_download_routes,
+)
+from pages.quotaStrategy import register_callbacks_quota_strategy
+from utils.metrics import instrument, register_metrics_routes
 
 # Defining custom colors
 custom_colors = [
@@ -50,54 +53,134 @@ app = dash.Dash(
 )
 register_callbacks(app)
 register_callbacks_data_explorer(app)
+register_callbacks_quota_strategy(app)
+register_download_routes(app)
+register_metrics_routes(app)
 app.title = "Compensation Dashboard"
 server = app.server
 
-# Load raw data
-deal_data = pd.read_excel(
-    "./data/compensationModelTaskData.xlsx", sheet_name="Deal Data"
-)
-ae_data = pd.read_excel("./data/compensationModelTaskData.xlsx", sheet_name="AE Data")
-
-
-# Run the compensation calculation
-deal_data, ae_data = calculate_compensation(
-    deal_data,
-    ae_data,
-    exceptions=[
-        {  # here I am building the model without catching the error that the deal_id is not in the data
-            "type": "shared_opportunity",
-            "deal_id": "006Qo000006yD5N",
-            "shares": {"NOLA-3": 0.3, "NOLA-2": 0.7},
-        },
-        {
-            "type": "adjust_acv",
-            "deal_id": "006Qo0000097tx3",
-            "adjustment_factor": 0.5,
-        },
-        {
-            "type": "close_date_payment",
-        },
-    ],
-)
+# Inputs of the compensation model
+DATA_PATH = "./data/compensationModelTaskData.xlsx"
+EXCEPTIONS_PATH = "./config/exceptions.json"
+TIERS_PATH = "./config/acceleratorTiers.json"
 
-# print("deal_data after atta:")
-# print(deal_data.head())
-# Verify the updated Invoice_Date values
-enterprise_upsells = deal_data[
-    (deal_data["Market"].isin(["NOLA", "SOLA"]))
-    & (deal_data["Type"] == "Upsell")
-    & (deal_data["Invoice_Date"].dt.year == 2025)
-]
-# print(enterprise_upsells[['Opportunity_ID', 'Close_Date', 'Invoice_Date']])
+# Log of the deltas applied through /admin/deals, replayed on every reload
+DELTA_LOG_PATH = os.environ.get("COMPENSATION_DELTA_LOG", "./data/dealDeltas.jsonl")
+
+# Seconds between checks of the inputs for changes (0 disables the watcher)
+WATCH_INTERVAL = float(os.environ.get("COMPENSATION_WATCH_INTERVAL", 5))
+
+# Token required by the admin endpoints when set
+ADMIN_TOKEN = os.environ.get("COMPENSATION_ADMIN_TOKEN")
+
+# Worker processes used to compute the dataset (0 for one per CPU core)
+WORKERS = int(os.environ.get("COMPENSATION_WORKERS", 1))
+
+# Shared directory (e.g. on /dev/shm) through which workers map a single copy
+# of the computed data; every worker keeps a private copy when unset
+SHARED_DIR = os.environ.get("COMPENSATION_SHARED_DIR")
+
+# When the data is computed: "sync" while app.py is imported, so that a
+# preforking server (see gunicorn.conf.py) shares it with its workers, or
+# "background" on a thread, serving requests right away (see /ready)
+WARMUP = os.environ.get("COMPENSATION_WARMUP", "sync")
+
+# Page modules by pathname, imported on first navigation
+PAGES = {
+    "/aeCompensation": "pages.aeCompensation",
+    "/insights": "pages.insights",
+    "/quotaStrategy": "pages.quotaStrategy",
+    "/modelOverview": "pages.modelOverview",
+    "/dataExplorer": "pages.dataExplorer",
+}
+DEFAULT_PAGE = "pages.overview"
+
+
+def load_dataset():
+    return load_dataset_snapshot(
+        DATA_PATH,
+        EXCEPTIONS_PATH,
+        tiers_path=TIERS_PATH,
+        delta_log_path=DELTA_LOG_PATH,
+        workers=WORKERS,
+        shared_dir=SHARED_DIR,
+    )
+
+
+# Callbacks read the data through app.server.dataset.snapshot, which reloads
+# swap atomically
+dataset = DatasetStore(load_dataset, delta_log=DELTA_LOG_PATH)
+app.server.dataset = dataset
+
+
+def warmup():
+    # Load the data and run the compensation calculation (served from the
+    # caches when the workbook and the exceptions are unchanged)
+    if not dataset.reload():
+        raise RuntimeError(f"Could not load the dataset: {dataset.last_error}")
+
+
+def start_warmup():
+    if WARMUP == "background":
+        threading.Thread(target=warmup, name="dataset-warmup", daemon=True).start()
+    else:
+        warmup()
+
+
+# Process whose watcher is running; threads do not survive the fork of a
+# preforked worker, so every serving process starts its own
+watcher_pid = None
+watcher_lock = threading.Lock()
+
+
+@server.before_request
+def start_watcher():
+    global watcher_pid
+    if WATCH_INTERVAL <= 0 or watcher_pid == os.getpid():
+        return
+    with watcher_lock:
+        if watcher_pid != os.getpid():
+            watcher_pid = os.getpid()
+            # The watcher also applies the deltas the other workers append
+            # to the delta log, without a full reload
+            dataset.watch(
+                [DATA_PATH, EXCEPTIONS_PATH, TIERS_PATH], interval=WATCH_INTERVAL
+            )
+
+
+@server.route("/ready")
+def readiness():
+    ready = dataset.snapshot is not None
+    return jsonify(ready=ready, **dataset.status()), 200 if ready else 503
+
+
+@server.route("/admin/reload", methods=["POST"])
+def reload_dataset():
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        abort(403)
+    started = dataset.reload_async()
+    return jsonify(started=started, **dataset.status()), 202
+
+
+@server.route("/admin/deals", methods=["POST"])
+def apply_deals_delta():
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        abort(403)
+    if dataset.snapshot is None:
+        abort(503)
+    try:
+        dataset.apply_delta(request.get_json(force=True))
+    except (KeyError, ValueError) as error:
+        return jsonify(error=str(error), **dataset.status()), 400
+    return jsonify(dataset.status())
+
+
+@server.route("/admin/dataset")
+def dataset_status():
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        abort(403)
+    return jsonify(dataset.status())
 
-# Attach data to app.server for global access
-app.server.deal_data = deal_data
-app.server.ae_data = ae_data
-# print("deal_data columns:", deal_data.columns)
-# print("ae_data columns:", ae_data.columns)
-# print("deal_data after atta:")
-# print(deal_data.head())
 
 # Define the layout
 app.layout = html.Div(
@@ -114,21 +197,24 @@ app.layout = html.Div(
 
 # Callback for dynamic page rendering
 @app.callback(Output("page-content", "children"), [Input("url", "pathname")])
+@instrument("display_page")
 def display_page(pathname):
-    if pathname == "/aeCompensation":
-        return aeCompensation.create_layout(app)
-    elif pathname == "/insights":
-        return insights.create_layout(app)
-    elif pathname == "/quotaStrategy":
-        return quotaStrategy.create_layout(app)
-    elif pathname == "/modelOverview":
-        return modelOverview.create_layout(app)
-    elif pathname == "/dataExplorer":
-        return dataExplorer.create_layout(app)
-    else:
-        # Default to overview
-        return overview.create_layout(app)
+    if dataset.snapshot is None:
+        return html.P(
+            "The data is loading, please refresh in a moment.",
+            className="page-description",
+        )
+
+    # Default to overview
+    page = importlib.import_module(PAGES.get(pathname, DEFAULT_PAGE))
+    return page.create_layout(app)
 
 
 if __name__ == "__main__":
+    # The reloader runs this file in a monitoring process and again in the
+    # serving child (WERKZEUG_RUN_MAIN); only the child loads the data
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warmup()
     app.run_server(debug=True, use_reloader=True)
+else:
+    start_warmup()
@@ -0,0 +1,199 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import generate_dataset
+from compensation_model.acceleratorCalculation import (
+    calculate_accelerator_table,
+    calculate_monthly_accelerators,
+)
+from compensation_model.calculations import calculate_compensation
+from compensation_model.compensationCube import build_compensation_cube
+from compensation_model.paymentIndex import PaymentIndex
+from compensation_model.schema import compact_frames
+from pages import aeCompensation, overview
+
+# Exceptions exercised by the calculate_compensation stage
+BENCHMARK_EXCEPTIONS = [{"type": "close_date_payment"}]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(stage, setup, repeat):
+    """
+    Time a stage and record its peak traced memory.
+
+    Parameters:
+    - stage: Callable receiving the value returned by setup.
+    - setup: Callable preparing the (untimed) input of each run.
+    - repeat: Number of timed runs.
+
+    Returns:
+    - result: Dictionary with the min/median seconds and the peak memory (MB).
+    """
+    timings = []
+    for _ in range(repeat):
+        arguments = setup()
+        start = time.perf_counter()
+        stage(arguments)
+        timings.append(time.perf_counter() - start)
+
+    # Profile memory in a separate run, as tracing slows the stage down
+    arguments = setup()
+    tracemalloc.start()
+    stage(arguments)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings),
+        "peak_memory_mb": peak / 2**20,
+    }
+
+
+def benchmark_size(n_deals, n_aes, repeat, seed=0):
+    """
+    Benchmark every stage on one synthetic dataset size.
+
+    Parameters:
+    - n_deals: Number of deals.
+    - n_aes: Number of AEs.
+    - repeat: Number of timed runs per stage.
+    - seed: Seed of the data generator.
+
+    Returns:
+    - results: List of result dictionaries, one per stage.
+    """
+    raw_deals, raw_aes = generate_dataset(n_deals, n_aes, seed=seed)
+    # Downstream stages run on the compact frames held by the dashboard
+    deal_data, ae_data = compact_frames(
+        *calculate_compensation(raw_deals.copy(), raw_aes.copy(), BENCHMARK_EXCEPTIONS)
+    )
+    year = int(deal_data["Close_Date"].dt.year.max())
+    cube = build_compensation_cube(deal_data, ae_data)
+    payment_index = PaymentIndex(deal_data)
+    # Second quarter of the latest year
+    quarter = (
+        pd.Timestamp(year=year, month=4, day=1),
+        pd.Timestamp(year=year, month=7, day=1),
+    )
+
+    stages = {
+        "calculate_compensation": (
+            lambda: (raw_deals.copy(), raw_aes.copy()),
+            lambda data: calculate_compensation(*data, BENCHMARK_EXCEPTIONS),
+        ),
+        "calculate_monthly_accelerators": (
+            lambda: None,
+            lambda _: calculate_monthly_accelerators(deal_data, ae_data, year, 12),
+        ),
+        "calculate_accelerator_table": (
+            lambda: None,
+            lambda _: calculate_accelerator_table(deal_data, ae_data),
+        ),
+        "build_compensation_cube": (
+            lambda: None,
+            lambda _: build_compensation_cube(deal_data, ae_data),
+        ),
+        "PaymentIndex": (
+            lambda: None,
+            lambda _: PaymentIndex(deal_data),
+        ),
+        "PaymentIndex.totals": (
+            lambda: None,
+            lambda _: payment_index.totals(deal_data, *quarter),
+        ),
+        "aeCompensation.create_summary": (
+            lambda: None,
+            lambda _: aeCompensation.create_summary(
+                deal_data, ae_data, year, 6, cube=cube
+            ),
+        ),
+        "overview.create_summary": (
+            lambda: None,
+            lambda _: overview.create_summary(deal_data),
+        ),
+    }
+
+    results = []
+    for name, (setup, stage) in stages.items():
+        result = measure(stage, setup, repeat)
+        result.update({"stage": name, "deals": n_deals, "aes": n_aes})
+        results.append(result)
+        print(
+            f"{name:<34} deals={n_deals:<9} aes={n_aes:<6} "
+            f"median={result['seconds_median'] * 1000:10.2f} ms "
+            f"peak={result['peak_memory_mb']:9.1f} MB"
+        )
+    return results
+
+
+def compare(results, baseline):
+    """
+    Print the median time ratio of each stage against a previous run.
+
+    Parameters:
+    - results: Results of the current run.
+    - baseline: Report loaded from a previous run's output file.
+    """
+    previous = {
+        (result["stage"], result["deals"], result["aes"]): result
+        for result in baseline["results"]
+    }
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for result in results:
+        key = (result["stage"], result["deals"], result["aes"])
+        if key in previous:
+            ratio = result["seconds_median"] / previous[key]["seconds_median"]
+            print(f"{key[0]:<34} deals={key[1]:<9} aes={key[2]:<6} x{ratio:.2f}")
+
+
+def main():
+    """Benchmark the compensation pipeline on synthetic datasets."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--deals", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--aes", type=int, nargs="+", default=[10, 1_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    args = parser.parse_args()
+
+    results = []
+    for n_deals in args.deals:
+        for n_aes in args.aes:
+            results.extend(benchmark_size(n_deals, n_aes, args.repeat, args.seed))
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+DEAL_TYPES = ["New", "Upsell", "Renewal"]
+DEAL_TYPE_WEIGHTS = [0.3, 0.6, 0.1]
+REGIONS = ["NOLA", "SOLA", "EMEA", "APAC"]
+LEAD_SOURCES = ["Customer Referral", "Cold Call", "IVA", "Sales Investor", "Website"]
+
+
+def generate_ae_data(n_aes, seed=0):
+    """
+    Generate a synthetic "AE Data" sheet.
+
+    Parameters:
+    - n_aes: Number of AEs.
+    - seed: Seed of the random generator.
+
+    Returns:
+    - ae_data: DataFrame with the columns of the "AE Data" sheet.
+    """
+    rng = np.random.default_rng(seed)
+    regions = np.array(REGIONS)[np.arange(n_aes) % len(REGIONS)]
+    return pd.DataFrame(
+        {
+            "AE": [
+                f"{region}-{i // len(REGIONS) + 1}" for i, region in enumerate(regions)
+            ],
+            "Base Salary (Annual)": rng.integers(60_000, 160_000, n_aes),
+            "Quota": rng.integers(40_000, 120_000, n_aes) * 10,
+        }
+    )
+
+
+def generate_deal_data(n_deals, ae_data, start_year=2023, years=2, seed=0):
+    """
+    Generate a synthetic "Deal Data" sheet for the given AEs.
+
+    Deals are spread uniformly over the years; about 20% have no invoice
+    date and 1% have no ACV, like the gaps found in the real workbook.
+
+    Parameters:
+    - n_deals: Number of deals.
+    - ae_data: AE sheet (as returned by generate_ae_data) owning the deals.
+    - start_year: First year of close dates.
+    - years: Number of years covered by the close dates.
+    - seed: Seed of the random generator.
+
+    Returns:
+    - deal_data: DataFrame with the columns of the "Deal Data" sheet.
+    """
+    rng = np.random.default_rng(seed + 1)
+    start = np.datetime64(f"{start_year}-01-01", "D")
+    end = np.datetime64(f"{start_year + years}-01-01", "D")
+    span = (end - start).astype(int)
+
+    owner_index = rng.integers(0, len(ae_data), n_deals)
+    owners = ae_data["AE"].to_numpy()[owner_index]
+    # AEs are assigned to regions round-robin by generate_ae_data
+    owner_regions = np.array(REGIONS)[owner_index % len(REGIONS)]
+    close_date = start + rng.integers(0, span, n_deals).astype("timedelta64[D]")
+    invoice_date = close_date + rng.integers(0, 60, n_deals).astype("timedelta64[D]")
+    invoice_date = np.where(
+        rng.random(n_deals) < 0.2, np.datetime64("NaT"), invoice_date
+    )
+    acv = np.round(rng.gamma(2.0, 20_000.0, n_deals), 2)
+    acv[rng.random(n_deals) < 0.01] = np.nan
+
+    return pd.DataFrame(
+        {
+            "Opportunity ID": "006Qo"
+            + pd.Series(np.arange(n_deals)).astype(str).str.zfill(10),
+            "Opportunity Owner": owners,
+            "Type": rng.choice(DEAL_TYPES, n_deals, p=DEAL_TYPE_WEIGHTS),
+            "ACV": acv,
+            "Services": np.round(rng.gamma(1.0, 3_000.0, n_deals), 2),
+            "Close Date": close_date.astype("datetime64[ns]"),
+            "Invoice Date": invoice_date.astype("datetime64[ns]"),
+            "Market": rng.choice(REGIONS, n_deals),
+            "Opp Global Region": owner_regions,
+            "Lead Source": rng.choice(LEAD_SOURCES, n_deals),
+        }
+    )
+
+
+def generate_dataset(n_deals, n_aes, seed=0):
+    """
+    Generate matching synthetic "Deal Data" and "AE Data" sheets.
+
+    Parameters:
+    - n_deals: Number of deals (e.g. 1k to 10M).
+    - n_aes: Number of AEs (e.g. 10 to 10k).
+    - seed: Seed of the random generator.
+
+    Returns:
+    - deal_data: DataFrame with the columns of the "Deal Data" sheet.
+    - ae_data: DataFrame with the columns of the "AE Data" sheet.
+    """
+    ae_data = generate_ae_data(n_aes, seed=seed)
+    return generate_deal_data(n_deals, ae_data, seed=seed), ae_data
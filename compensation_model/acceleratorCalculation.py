@@ -1,79 +1,174 @@
+import numpy as np
 import pandas as pd
+from compensation_model.acceleratorTiers import DEFAULT_ACCELERATOR_TIERS
 
+# Columns of the accelerator table returned by calculate_accelerator_table
+ACCELERATOR_COLUMNS = [
+    "AE",
+    "Year",
+    "Month",
+    "Attainment",
+    "cumulative_new_logos",
+    "Accelerator_Bonus",
+]
 
-def calculate_monthly_accelerators(deal_data, ae_data, year, month):
-    # Filter deals for the given year
-    deal_data = deal_data[deal_data["Close_Date"].dt.year == year]
-    ae_accelerators = []
-
-    # Iterate through each AE
-    for ae in ae_data["AE"].unique():
-        # Filter deals for this AE
-        ae_deals = deal_data[deal_data["AE"] == ae]
-        # Initialize dictionaries to store monthly results
-        monthly_attainment = {}
-        monthly_new_logos = {}
-        accelerator_bonus_by_month = {}
-
-        # Iterate month by month up to the selected month
-        for current_month in range(1, month + 1):
-            # Filter deals up to the current month
-            monthly_deals = ae_deals[ae_deals["Close_Date"].dt.month <= current_month]
-
-            # Calculate monthly attainment
-            monthly_attainment[current_month] = (
-                monthly_deals["ACV"].sum()
-                / ae_data.loc[ae_data["AE"] == ae, "Quota"].values[0]
-            )
+# Bonuses are paid in the month following the one they are earned in, without
+# exceeding the year
+PAYMENT_MONTHS = np.arange(2, 13)
+
+
+def calculate_accelerator_table(
+    deal_data, ae_data, tiers=DEFAULT_ACCELERATOR_TIERS, years=None
+):
+    """
+    Calculate the monthly accelerator bonuses of every AE and close year at once.
+
+    Deals are grouped once by (AE, close year, close month) and accumulated
+    with a prefix sum per AE and year, so the tiers are evaluated over the
+    whole AE x year x month grid in one pass. Any year or month cutoff is
+    then a slice of the table (see slice_accelerators).
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+    - ae_data: DataFrame containing AE information (quota, etc.).
+    - tiers: AcceleratorTiers of the plan (the table of each year applies).
+    - years: Optional close years to cover; every close year in the deals
+      when omitted.
 
-            # Calculate monthly new logos count
-            monthly_new_logos[current_month] = monthly_deals[
-                monthly_deals["Type"] == "New"
-            ].shape[0]
-
-            # Check if the accelerator is unlocked and calculate the bonus
-            if (
-                monthly_attainment[current_month] > 2.0
-                and monthly_new_logos[current_month] >= 5
-            ):
-                bonus = monthly_deals["New_Logo_Comp"].sum() * 2.0  # 200% accelerator
-            elif (
-                monthly_attainment[current_month] > 1.5
-                and monthly_new_logos[current_month] >= 4
-            ):
-                bonus = monthly_deals["New_Logo_Comp"].sum() * 1.0  # 100% accelerator
-            elif (
-                monthly_attainment[current_month] > 1.25
-                and monthly_new_logos[current_month] >= 4
-            ):
-                bonus = monthly_deals["New_Logo_Comp"].sum() * 0.5  # 50% accelerator
-            elif (
-                monthly_attainment[current_month] > 1.0
-                and monthly_new_logos[current_month] >= 3
-            ):
-                bonus = monthly_deals["New_Logo_Comp"].sum() * 0.3  # 30% accelerator
-            else:
-                bonus = 0
-
-            # Pay the bonus in the following month
-            payment_month = current_month + 1
-            if payment_month <= 12:  # Ensure we don't exceed the year
-                if payment_month not in accelerator_bonus_by_month:
-                    accelerator_bonus_by_month[payment_month] = 0
-                accelerator_bonus_by_month[payment_month] += bonus
-
-        # Store the AE's accelerator bonuses
-        for payment_month, bonus in accelerator_bonus_by_month.items():
-            ae_accelerators.append(
-                {
-                    "AE": ae,
-                    "Month": payment_month,
-                    "Attainment": monthly_attainment.get(payment_month, 0),
-                    "cumulative_new_logos": monthly_new_logos.get(payment_month, 0),
-                    "Accelerator_Bonus": bonus,
-                }
+    Returns:
+    - accelerator_df: DataFrame with one row per AE, Year and payment Month
+      (2-12) holding the Attainment and cumulative_new_logos through the
+      payment month and the Accelerator_Bonus earned through the month before.
+    """
+    close_year = deal_data["Close_Date"].dt.year
+    if years is None:
+        years = np.sort(close_year.dropna().unique().astype(int))
+    years = pd.Index(years)
+    aes = pd.Index(ae_data["AE"].unique())
+    if aes.empty or years.empty:
+        return pd.DataFrame(columns=ACCELERATOR_COLUMNS)
+
+    # Group the deals once by AE, close year and close month
+    deal_data = deal_data[close_year.isin(years) & deal_data["AE"].isin(aes)]
+    monthly = (
+        deal_data.assign(
+            Year=deal_data["Close_Date"].dt.year.astype(int),
+            Month=deal_data["Close_Date"].dt.month.astype(int),
+            New_Logos=(deal_data["Type"] == "New").astype(int),
+        )
+        .groupby(["AE", "Year", "Month"], observed=True)
+        .agg(
+            ACV=("ACV", "sum"),
+            New_Logos=("New_Logos", "sum"),
+            New_Logo_Comp=("New_Logo_Comp", "sum"),
+        )
+    )
+
+    # Lay the totals out on the AE x year x month grid and accumulate them
+    # per AE and year
+    grid = np.zeros((len(aes), len(years), 12, 3))
+    grid[
+        aes.get_indexer(monthly.index.get_level_values("AE")),
+        years.get_indexer(monthly.index.get_level_values("Year")),
+        monthly.index.get_level_values("Month").to_numpy() - 1,
+    ] = monthly.to_numpy(dtype=float)
+    cumulative_acv, cumulative_new_logos, cumulative_new_logo_comp = np.moveaxis(
+        grid.cumsum(axis=2), -1, 0
+    )
+
+    # Use the first quota listed for each AE
+    quota = (
+        ae_data.drop_duplicates(subset="AE")
+        .set_index("AE")["Quota"]
+        .reindex(aes)
+        .to_numpy(dtype=float)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        attainment = cumulative_acv / quota[:, np.newaxis, np.newaxis]
+
+    # Check which accelerator is unlocked with the tiers of each year
+    accelerator_rate = np.stack(
+        [
+            tiers.multiplier(
+                attainment[:, position],
+                cumulative_new_logos[:, position],
+                year=year,
             )
+            for position, year in enumerate(years)
+        ],
+        axis=1,
+    )
+    bonus = cumulative_new_logo_comp * accelerator_rate
 
-    # Convert to DataFrame
-    accelerator_df = pd.DataFrame(ae_accelerators)
+    # The bonus earned in a month is paid in the next one
+    rows = len(aes) * len(years) * PAYMENT_MONTHS.size
+    accelerator_df = pd.DataFrame(
+        {
+            "AE": np.repeat(aes.to_numpy(), len(years) * PAYMENT_MONTHS.size),
+            "Year": np.tile(np.repeat(years.to_numpy(), PAYMENT_MONTHS.size), len(aes)),
+            "Month": np.resize(PAYMENT_MONTHS, rows),
+            "Attainment": attainment[..., PAYMENT_MONTHS - 1].ravel(),
+            "cumulative_new_logos": cumulative_new_logos[..., PAYMENT_MONTHS - 1]
+            .astype(int)
+            .ravel(),
+            "Accelerator_Bonus": bonus[..., PAYMENT_MONTHS - 2].ravel(),
+        },
+        columns=ACCELERATOR_COLUMNS,
+    )
     return accelerator_df
+
+
+def slice_accelerators(accelerator_df, year, month):
+    """
+    Select the monthly accelerators of one year up to a given month.
+
+    Parameters:
+    - accelerator_df: DataFrame returned by calculate_accelerator_table.
+    - year: Close year to select.
+    - month: Last month (1-12) whose cumulative results earn a bonus.
+
+    Returns:
+    - accelerator_df: DataFrame with one row per AE and payment month holding
+      the Attainment, cumulative_new_logos and Accelerator_Bonus.
+    """
+    rows = accelerator_df[
+        (accelerator_df["Year"] == year) & (accelerator_df["Month"] <= month + 1)
+    ]
+
+    # The attainment reported for the payment month is only known up to the
+    # selected month
+    known = rows["Month"] <= month
+    return (
+        rows.assign(
+            Attainment=rows["Attainment"].where(known, 0),
+            cumulative_new_logos=rows["cumulative_new_logos"].where(known, 0),
+        )
+        .drop(columns="Year")
+        .reset_index(drop=True)
+    )
+
+
+def calculate_monthly_accelerators(
+    deal_data, ae_data, year, month, tiers=DEFAULT_ACCELERATOR_TIERS
+):
+    """
+    Calculate the monthly accelerator bonus of every AE up to a given month.
+
+    Callers needing several years or months should slice a single
+    calculate_accelerator_table instead.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+    - ae_data: DataFrame containing AE information (quota, etc.).
+    - year: Year of the close dates to consider.
+    - month: Last month (1-12) whose cumulative results earn a bonus.
+    - tiers: AcceleratorTiers of the plan (the table of the year applies).
+
+    Returns:
+    - accelerator_df: DataFrame with one row per AE and payment month holding
+      the Attainment, cumulative_new_logos and Accelerator_Bonus.
+    """
+    accelerator_df = calculate_accelerator_table(
+        deal_data, ae_data, tiers, years=[year]
+    )
+    return slice_accelerators(accelerator_df, year, month)
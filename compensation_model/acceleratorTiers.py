@@ -0,0 +1,110 @@
+import json
+
+import numpy as np
+
+# Accelerator tiers of the compensation plan, from the highest to the lowest
+DEFAULT_TIERS = [
+    {"threshold": 2.0, "min_new_logos": 5, "multiplier": 2.0},  # 200% accelerator
+    {"threshold": 1.5, "min_new_logos": 4, "multiplier": 1.0},  # 100% accelerator
+    {"threshold": 1.25, "min_new_logos": 4, "multiplier": 0.5},  # 50% accelerator
+    {"threshold": 1.0, "min_new_logos": 3, "multiplier": 0.3},  # 30% accelerator
+]
+
+
+def _compile(tiers):
+    # Lay a tier list out as threshold, minimum and multiplier arrays
+    try:
+        return (
+            np.array([tier["threshold"] for tier in tiers], dtype=float),
+            np.array([tier["min_new_logos"] for tier in tiers], dtype=float),
+            np.array([tier["multiplier"] for tier in tiers], dtype=float),
+        )
+    except (KeyError, TypeError) as error:
+        raise ValueError(f"Invalid accelerator tier: {error!r}") from error
+
+
+class AcceleratorTiers:
+    """
+    Accelerator tier tables of the compensation plan, compiled for array lookups.
+
+    A tier is unlocked when the attainment exceeds its threshold and the
+    number of new logos reaches its minimum. The first unlocked tier, in the
+    order of the table, sets the multiplier of the new logo compensation.
+
+    Parameters:
+    - tables: Dictionary of plan year -> list of tiers, each a dict with the
+      threshold, min_new_logos and multiplier. The "default" table applies
+      to the years without their own and to the annual accelerator.
+
+    Raises:
+    - ValueError: If the default table is missing or a tier is incomplete.
+    """
+
+    def __init__(self, tables):
+        if "default" not in tables:
+            raise ValueError("The accelerator tiers need a default table")
+        self.tables = {str(year): list(tiers) for year, tiers in tables.items()}
+        self._compiled = {year: _compile(tiers) for year, tiers in self.tables.items()}
+
+    def arrays(self, year=None):
+        """
+        Get the compiled table of a plan year.
+
+        Parameters:
+        - year: Plan year; the default table when None or without a table.
+
+        Returns:
+        - thresholds, min_new_logos, multipliers: Arrays with one entry per tier.
+        """
+        return self._compiled.get(str(year), self._compiled["default"])
+
+    def multiplier(self, attainment, new_logos, year=None, thresholds=None):
+        """
+        Look up the accelerator multiplier over arrays of attainment and logos.
+
+        Parameters:
+        - attainment: Array of attainments (NaN unlocks no tier).
+        - new_logos: Array of new logo counts, broadcastable against attainment.
+        - year: Plan year whose table applies (see arrays).
+        - thresholds: Optional thresholds replacing the table's, one entry
+          per tier, each broadcastable against attainment.
+
+        Returns:
+        - multiplier: Array of multipliers, 0 where no tier is unlocked.
+        """
+        table_thresholds, min_new_logos, multipliers = self.arrays(year)
+        if thresholds is None:
+            thresholds = table_thresholds
+        attainment = np.asarray(attainment, dtype=float)
+        new_logos = np.asarray(new_logos, dtype=float)
+        return np.select(
+            [
+                (attainment > thresholds[tier]) & (new_logos >= min_new_logos[tier])
+                for tier in range(multipliers.size)
+            ],
+            multipliers,
+            default=0.0,
+        )
+
+
+DEFAULT_ACCELERATOR_TIERS = AcceleratorTiers({"default": DEFAULT_TIERS})
+
+
+def load_accelerator_tiers(path):
+    """
+    Read the accelerator tier tables from a JSON file.
+
+    Parameters:
+    - path: Path of the JSON file, holding either a list of tiers (used for
+      every year) or an object of plan year (or "default") -> list of tiers.
+
+    Returns:
+    - tiers: AcceleratorTiers of the file.
+    """
+    with open(path) as file:
+        tables = json.load(file)
+    if isinstance(tables, list):
+        tables = {"default": tables}
+    if not isinstance(tables, dict):
+        raise ValueError(f"{path} must contain a list or an object of tier lists")
+    return AcceleratorTiers(tables)
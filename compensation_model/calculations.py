@@ -1,24 +1,55 @@
 import pandas as pd
+from compensation_model.acceleratorTiers import DEFAULT_ACCELERATOR_TIERS
+from compensation_model.exceptionRules import apply_exceptions
 
+# Deal types whose ACV is paid at the AE's ACV rate
+RATED_DEAL_TYPES = ["Upsell", "New"]
 
-def calculate_compensation(deal_data, ae_data, exceptions):
+
+def resolve_acv_rates(deal_data, ae_data):
     """
-    Calculate compensation for Account Executives based on provided deal and AE data.
+    Resolve the ACV rate of each deal's AE with a single indexed lookup.
 
     Parameters:
-    - deal_data: DataFrame containing deal information.
-    - ae_data: DataFrame containing AE information (base salary, quota, etc.).
-    - exceptions: List of exceptions to apply to specific deals.
+    - deal_data: DataFrame containing deal information (with an "AE" column).
+    - ae_data: DataFrame containing AE information (with "AE" and "ACV_Rate").
 
     Returns:
-    - ae_summary: DataFrame summarizing compensation by AE.
+    - acv_rates: Series of ACV rates aligned with deal_data's index.
+
+    Raises:
+    - ValueError: If an Upsell or New deal belongs to an AE missing from ae_data.
     """
+    # Build the AE -> rate index once; the first entry wins for duplicated AEs
+    rate_by_ae = ae_data.drop_duplicates(subset="AE").set_index("AE")["ACV_Rate"]
+    acv_rates = deal_data["AE"].map(rate_by_ae)
 
-    # print("ae_data columns:", ae_data.columns)
+    # Only rated deal types need a rate, so unknown AEs elsewhere are harmless
+    unknown = ~deal_data["AE"].isin(rate_by_ae.index) & deal_data["Type"].isin(
+        RATED_DEAL_TYPES
+    )
+    if unknown.any():
+        unknown_aes = sorted(deal_data.loc[unknown, "AE"].astype(str).unique())
+        raise ValueError(
+            f"Deals reference AEs missing from the AE data: {', '.join(unknown_aes)}"
+        )
+
+    return acv_rates
+
+
+def prepare_deal_data(deal_data):
+    """
+    Normalize the column names and types of the raw deal data.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information, as read from the workbook.
+
+    Returns:
+    - deal_data: DataFrame with underscore column names, an "AE" column and
+      parsed dates and amounts.
+    """
     # Rename columns
     deal_data.columns = deal_data.columns.str.replace(" ", "_")
-    ae_data.columns = ae_data.columns.str.replace(" ", "_")
-    ae_data.rename(columns={"Base_Salary_(Annual)": "Base_Salary_Annual"}, inplace=True)
     deal_data.rename(columns={"Opportunity_Owner": "AE"}, inplace=True)
 
     # print("deal_data columns:", deal_data.columns)
@@ -30,6 +61,25 @@ def calculate_compensation(deal_data, ae_data, exceptions):
     deal_data["ACV"] = pd.to_numeric(deal_data["ACV"], errors="coerce")
     deal_data["Services"] = pd.to_numeric(deal_data["Services"], errors="coerce")
 
+    return deal_data
+
+
+def prepare_ae_data(ae_data):
+    """
+    Normalize the raw AE data and derive each AE's ACV rate.
+
+    Parameters:
+    - ae_data: DataFrame containing AE information, as read from the workbook.
+
+    Returns:
+    - ae_data: DataFrame with underscore column names, numeric salary and
+      quota, and the ACV_Rate column.
+    """
+    # print("ae_data columns:", ae_data.columns)
+    # Rename columns
+    ae_data.columns = ae_data.columns.str.replace(" ", "_")
+    ae_data.rename(columns={"Base_Salary_(Annual)": "Base_Salary_Annual"}, inplace=True)
+
     ae_data["Base_Salary_Annual"] = pd.to_numeric(
         ae_data["Base_Salary_Annual"], errors="coerce"
     )
@@ -38,6 +88,24 @@ def calculate_compensation(deal_data, ae_data, exceptions):
     # Calculate ACV Rate for each AE
     ae_data["ACV_Rate"] = ae_data["Base_Salary_Annual"] / ae_data["Quota"]
 
+    return ae_data
+
+
+def calculate_deal_compensation(deal_data, ae_data, exceptions):
+    """
+    Calculate the compensation of every deal, exceptions included.
+
+    Exceptions act on the rows of one Opportunity_ID at a time, so any subset
+    of opportunities can be computed on its own.
+
+    Parameters:
+    - deal_data: DataFrame returned by prepare_deal_data.
+    - ae_data: DataFrame holding the AE and ACV_Rate columns.
+    - exceptions: List of exceptions to apply to specific deals.
+
+    Returns:
+    - deal_data: DataFrame with the per-deal compensation columns.
+    """
     # Initialize compensation components
     deal_data["Upsell_Comp"] = 0
     deal_data["New_Logo_Comp"] = 0
@@ -46,77 +114,17 @@ def calculate_compensation(deal_data, ae_data, exceptions):
         deal_data["Services"] * 0.015
     )  # 1.5% commission on services
 
-    # Calculate Upsell and New Logo compensations
-    deal_data["Upsell_Comp"] = deal_data.apply(
-        lambda x: (
-            x["ACV"] * ae_data.loc[ae_data["AE"] == x["AE"], "ACV_Rate"].values[0]
-            if x["Type"] == "Upsell"
-            else 0
-        ),
-        axis=1,
+    # Calculate Upsell and New Logo compensations from a one-time AE -> rate join
+    acv_rates = resolve_acv_rates(deal_data, ae_data)
+    deal_data["Upsell_Comp"] = (deal_data["ACV"] * acv_rates).where(
+        deal_data["Type"] == "Upsell", 0
     )
-    deal_data["New_Logo_Comp"] = deal_data.apply(
-        lambda x: (
-            x["ACV"] * ae_data.loc[ae_data["AE"] == x["AE"], "ACV_Rate"].values[0] * 1.1
-            if x["Type"] == "New"
-            else 0
-        ),
-        axis=1,
+    deal_data["New_Logo_Comp"] = (deal_data["ACV"] * acv_rates * 1.1).where(
+        deal_data["Type"] == "New", 0
     )
 
-    # Apply exceptions dynamically
-    for exception in exceptions:
-        if exception["type"] == "shared_opportunity":
-            deal_id = exception["deal_id"]
-            shares = exception["shares"]  # Dict of AE -> share percentage
-            for ae, share in shares.items():
-                if (
-                    ae
-                    == deal_data.loc[
-                        deal_data["Opportunity_ID"] == deal_id, "AE"
-                    ].values[0]
-                ):
-                    # Modify original AE's ACV and Services
-                    deal_data.loc[
-                        deal_data["Opportunity_ID"] == deal_id, "ACV"
-                    ] *= share
-                    deal_data.loc[
-                        deal_data["Opportunity_ID"] == deal_id, "Services"
-                    ] *= share
-                else:
-                    # Add a new row for the shared AE
-                    original_row = (
-                        deal_data.loc[deal_data["Opportunity_ID"] == deal_id]
-                        .iloc[0]
-                        .copy()
-                    )
-                    original_row["AE"] = ae
-                    original_row["ACV"] *= share
-                    original_row["Services"] *= share
-                    deal_data = pd.concat(
-                        [deal_data, pd.DataFrame([original_row])], ignore_index=True
-                    )
-
-        elif exception["type"] == "adjust_acv":
-            deal_id = exception["deal_id"]
-            adjustment_factor = exception["adjustment_factor"]
-            deal_data.loc[
-                deal_data["Opportunity_ID"] == deal_id, "ACV"
-            ] *= adjustment_factor
-
-        elif exception["type"] == "close_date_payment":
-
-            for _, row in deal_data.iterrows():
-                if (
-                    row["Opp_Global_Region"] in ["NOLA", "SOLA"]
-                    and row["Type"] == "Upsell"
-                    and pd.isna(row["Invoice_Date"])
-                ):
-                    # Update Invoice Date to the next month after Close Date
-                    deal_data.loc[
-                        deal_data["Opportunity_ID"] == row["Opportunity_ID"],
-                        "Payment_Date",
-                    ] = row["Close_Date"] + pd.DateOffset(months=1)
+    # Apply exceptions, batched by rule type
+    deal_data = apply_exceptions(deal_data, exceptions)
 
     # Recalculate Services Compensation after adjustments
     deal_data["Services_Comp"] = deal_data["Services"] * 0.015
@@ -128,10 +136,40 @@ def calculate_compensation(deal_data, ae_data, exceptions):
         + deal_data["Services_Comp"]
     )
 
+    return deal_data
+
+
+def calculate_annual_accelerator(ae_data, tiers=DEFAULT_ACCELERATOR_TIERS):
+    """
+    Calculate the accelerator bonus of every AE for new logo attainment in a year.
+
+    Parameters:
+    - ae_data: DataFrame of AEs with Attainment, New_Count and New_Logo_Comp.
+    - tiers: AcceleratorTiers of the plan (its default table applies).
+
+    Returns:
+    - bonus: Series with the accelerator bonus of each AE.
+    """
+    multiplier = tiers.multiplier(ae_data["Attainment"], ae_data["New_Count"])
+    return ae_data["New_Logo_Comp"] * multiplier
+
+
+def aggregate_ae_compensation(deal_data, ae_data, tiers=DEFAULT_ACCELERATOR_TIERS):
+    """
+    Aggregate the per-deal compensation by AE and add the accelerators.
+
+    Parameters:
+    - deal_data: DataFrame returned by calculate_deal_compensation.
+    - ae_data: DataFrame returned by prepare_ae_data.
+    - tiers: AcceleratorTiers of the plan.
+
+    Returns:
+    - ae_data: DataFrame with the per-AE compensation.
+    """
     # Adding the number of new logos for each AE
     new_counts = (
         deal_data[deal_data["Type"] == "New"]
-        .groupby("AE")
+        .groupby("AE", observed=True)
         .size()
         .reset_index(name="New_Count")
     )
@@ -140,7 +178,7 @@ def calculate_compensation(deal_data, ae_data, exceptions):
     # Adding the number of new logos ACV for each AE
     new_acv = (
         deal_data[deal_data["Type"] == "New"]
-        .groupby("AE")["ACV"]
+        .groupby("AE", observed=True)["ACV"]
         .sum()
         .reset_index(name="New_ACV")
     )
@@ -148,7 +186,7 @@ def calculate_compensation(deal_data, ae_data, exceptions):
 
     # Aggregate compensation by AE
     ae_compensation = (
-        deal_data.groupby("AE")
+        deal_data.groupby("AE", observed=True)
         .agg(
             {
                 "Upsell_Comp": "sum",
@@ -171,20 +209,32 @@ def calculate_compensation(deal_data, ae_data, exceptions):
     # print(ae_data.head())
 
     # Calculate accelerators for new logo attainment in a year
-    def calculate_accelerators(row):
-        if row["Attainment"] > 2.0 and row["New_Count"] >= 5:
-            return row["New_Logo_Comp"] * 2.0  # 200% accelerator
-        elif row["Attainment"] > 1.5 and row["New_Count"] >= 4:
-            return row["New_Logo_Comp"] * 1.0  # 100% accelerator
-        elif row["Attainment"] > 1.25 and row["New_Count"] >= 4:
-            return row["New_Logo_Comp"] * 0.5  # 50% accelerator
-        elif row["Attainment"] > 1.0 and row["New_Count"] >= 3:
-            return row["New_Logo_Comp"] * 0.3  # 30% accelerator
-        return 0
-
-    ae_data["Accelerator_Bonus_Annual"] = ae_data.apply(calculate_accelerators, axis=1)
+    ae_data["Accelerator_Bonus_Annual"] = calculate_annual_accelerator(ae_data, tiers)
 
     # Update Total Compensation with Accelerator
     ae_data["Total_Comp"] += ae_data["Accelerator_Bonus_Annual"]
 
+    return ae_data
+
+
+def calculate_compensation(
+    deal_data, ae_data, exceptions, tiers=DEFAULT_ACCELERATOR_TIERS
+):
+    """
+    Calculate compensation for Account Executives based on provided deal and AE data.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+    - ae_data: DataFrame containing AE information (base salary, quota, etc.).
+    - exceptions: List of exceptions to apply to specific deals.
+    - tiers: AcceleratorTiers of the plan.
+
+    Returns:
+    - ae_summary: DataFrame summarizing compensation by AE.
+    """
+    deal_data = prepare_deal_data(deal_data)
+    ae_data = prepare_ae_data(ae_data)
+    deal_data = calculate_deal_compensation(deal_data, ae_data, exceptions)
+    ae_data = aggregate_ae_compensation(deal_data, ae_data, tiers)
+
     return deal_data, ae_data
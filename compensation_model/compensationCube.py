@@ -0,0 +1,250 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from compensation_model.acceleratorCalculation import calculate_accelerator_table
+from compensation_model.acceleratorTiers import DEFAULT_ACCELERATOR_TIERS
+from compensation_model.parallel import map_ae_partitions
+
+# Measures held by the cube for every (AE, payment year, payment month)
+CUBE_METRICS = [
+    "Upsell_Comp",
+    "New_Logo_Comp",
+    "Services_Comp",
+    "ACV",
+    "New_Count",
+    "Accelerator_Bonus",
+]
+
+
+class CompensationCube:
+    """
+    Materialized compensation aggregates indexed by (AE, payment year, payment month).
+
+    The measures live in a dense array of shape (AEs, years, 12, metrics), so
+    any year or month view is an array slice whose cost depends on the number
+    of AEs only.
+
+    Parameters:
+    - aes: Index of the AEs (rows of the cube).
+    - years: Index of the payment years covered by the cube.
+    - values: Array of shape (len(aes), len(years), 12, len(CUBE_METRICS)).
+    """
+
+    def __init__(self, aes, years, values):
+        self.aes = aes
+        self.years = years
+        self.values = values
+
+    def slice(self, year, month=None):
+        """
+        Aggregate the measures of every AE for a year and optional month.
+
+        Parameters:
+        - year: Payment year to slice.
+        - month: Optional payment month (1-12); the whole year when omitted.
+
+        Returns:
+        - period: DataFrame indexed by AE with one column per metric.
+        """
+        if year in self.years:
+            by_month = self.values[:, self.years.get_loc(year)]
+            values = by_month[:, month - 1] if month else by_month.sum(axis=1)
+        else:
+            values = np.zeros((len(self.aes), len(CUBE_METRICS)))
+        return pd.DataFrame(values, index=self.aes, columns=CUBE_METRICS)
+
+    def to_frame(self):
+        """
+        Flatten the cube into one row per (AE, Year, Month), e.g. for exports.
+
+        Returns:
+        - cube_df: DataFrame with AE, Year, Month and the metric columns.
+        """
+        index = pd.MultiIndex.from_product(
+            [self.aes, self.years, range(1, 13)], names=["AE", "Year", "Month"]
+        )
+        return pd.DataFrame(
+            self.values.reshape(-1, len(CUBE_METRICS)),
+            index=index,
+            columns=CUBE_METRICS,
+        ).reset_index()
+
+
+def _accumulate(values, aes, years, metric, ae, date, amount):
+    # Add the amounts to the (AE, year, month) cells of one metric
+    shape = values.shape[:3]
+    valid = date.notna().to_numpy()
+    cells = np.ravel_multi_index(
+        (
+            aes.get_indexer(ae[valid]),
+            years.get_indexer(date[valid].dt.year),
+            date[valid].dt.month.to_numpy() - 1,
+        ),
+        shape,
+    )
+    amount = np.nan_to_num(np.asarray(amount, dtype=float)[valid])
+    values[..., CUBE_METRICS.index(metric)] += np.bincount(
+        cells, weights=amount, minlength=values[..., 0].size
+    ).reshape(shape)
+
+
+def _accumulate_deals(values, aes, years, deal_data, sign=1):
+    # Add (or with sign=-1 remove) the deal-level measures of paid deals
+    deal_data = deal_data[~deal_data["Payment_Date"].isna()]
+    payment_date = deal_data["Payment_Date"]
+    service_date = deal_data["Close_Date"] + pd.DateOffset(months=1)
+
+    for metric in ["Upsell_Comp", "New_Logo_Comp", "ACV"]:
+        _accumulate(
+            values,
+            aes,
+            years,
+            metric,
+            deal_data["AE"],
+            payment_date,
+            sign * deal_data[metric],
+        )
+    _accumulate(
+        values,
+        aes,
+        years,
+        "New_Count",
+        deal_data["AE"],
+        payment_date,
+        sign * (deal_data["Type"] == "New").to_numpy(dtype=float),
+    )
+    _accumulate(
+        values,
+        aes,
+        years,
+        "Services_Comp",
+        deal_data["AE"],
+        service_date,
+        sign * deal_data["Services_Comp"],
+    )
+
+
+def _accumulate_accelerators(values, aes, years, accelerators):
+    # Place the bonuses on the month they are paid
+    if accelerators.empty:
+        return
+
+    paid = pd.to_datetime(
+        dict(year=accelerators["Year"], month=accelerators["Month"], day=1)
+    )
+    _accumulate(
+        values,
+        aes,
+        years,
+        "Accelerator_Bonus",
+        accelerators["AE"],
+        paid,
+        accelerators["Accelerator_Bonus"],
+    )
+
+
+def build_compensation_cube(
+    deal_data, ae_data, workers=1, tiers=DEFAULT_ACCELERATOR_TIERS
+):
+    """
+    Aggregate the computed deals into a CompensationCube.
+
+    Upsell, new logo, ACV and new logo counts are placed on the deal's
+    Payment_Date, services on their own payment date (one month after the
+    close date), and accelerator bonuses on the month they are paid.
+
+    Parameters:
+    - deal_data: DataFrame with the per-deal compensation.
+    - ae_data: DataFrame with the per-AE compensation.
+    - workers: Number of processes computing the accelerators of partitions
+      of the AEs (see map_ae_partitions).
+    - tiers: AcceleratorTiers of the plan.
+
+    Returns:
+    - cube: CompensationCube covering every AE and payment year in the data.
+    """
+    # Only deals with a valid Payment_Date are paid
+    deal_data = deal_data[~deal_data["Payment_Date"].isna()]
+
+    # Deals without an AE in the AE data still count towards global totals
+    aes = (
+        pd.Index(ae_data["AE"].unique())
+        .append(pd.Index(deal_data["AE"].unique()))
+        .unique()
+    )
+    years = _cube_years(deal_data)
+
+    values = np.zeros((len(aes), len(years), 12, len(CUBE_METRICS)))
+    _accumulate_deals(values, aes, years, deal_data)
+    for accelerators in map_ae_partitions(
+        partial(calculate_accelerator_table, tiers=tiers), deal_data, ae_data, workers
+    ):
+        _accumulate_accelerators(values, aes, years, accelerators)
+
+    return CompensationCube(aes, years, values)
+
+
+def _cube_years(deal_data):
+    # Payment, service and close years of the paid deals
+    payment_date = deal_data["Payment_Date"]
+    service_date = deal_data["Close_Date"] + pd.DateOffset(months=1)
+    return pd.Index(
+        sorted(
+            set(payment_date.dt.year.dropna().astype(int))
+            | set(service_date.dt.year.dropna().astype(int))
+            | set(deal_data["Close_Date"].dt.year.dropna().astype(int))
+        )
+    )
+
+
+def update_compensation_cube(
+    cube, deal_data, ae_data, removed, added, tiers=DEFAULT_ACCELERATOR_TIERS
+):
+    """
+    Update a CompensationCube with the deals changed by apply_deal_delta.
+
+    The removed rows are subtracted, the added rows accumulated and the
+    accelerators of the AEs owning a changed deal re-evaluated. The cube is
+    rebuilt from scratch when the delta brings a new AE or year.
+
+    Parameters:
+    - cube: CompensationCube of the data before the delta (left unmodified).
+    - deal_data: DataFrame with the per-deal compensation after the delta.
+    - ae_data: DataFrame with the per-AE compensation after the delta.
+    - removed: Computed deal rows dropped by the delta.
+    - added: Computed deal rows added by the delta.
+    - tiers: AcceleratorTiers of the plan.
+
+    Returns:
+    - cube: CompensationCube of the data after the delta.
+    """
+    paid = added[~added["Payment_Date"].isna()]
+    if not (
+        paid["AE"].isin(cube.aes).all() and _cube_years(paid).isin(cube.years).all()
+    ):
+        return build_compensation_cube(deal_data, ae_data, tiers=tiers)
+
+    values = np.array(cube.values)
+    _accumulate_deals(values, cube.aes, cube.years, removed, sign=-1)
+    _accumulate_deals(values, cube.aes, cube.years, added)
+
+    # Re-evaluate the accelerators of the AEs owning a changed deal
+    involved = pd.Index(removed["AE"]).append(pd.Index(added["AE"])).unique()
+    involved = involved[involved.isin(cube.aes)]
+    values[
+        cube.aes.get_indexer(involved), ..., CUBE_METRICS.index("Accelerator_Bonus")
+    ] = 0
+    deal_data = deal_data[
+        ~deal_data["Payment_Date"].isna() & deal_data["AE"].isin(involved)
+    ]
+    _accumulate_accelerators(
+        values,
+        cube.aes,
+        cube.years,
+        calculate_accelerator_table(
+            deal_data, ae_data[ae_data["AE"].isin(involved)], tiers
+        ),
+    )
+
+    return CompensationCube(cube.aes, cube.years, values)
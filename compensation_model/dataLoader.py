@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = "./data/compensationModelTaskData.xlsx"
+
+# Frames loaded from the workbook and the sheet each one comes from
+SHEETS = {"deal_data": "Deal Data", "ae_data": "AE Data"}
+
+MANIFEST_NAME = "manifest.json"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """
+    Hash a file's contents without reading it into memory at once.
+
+    Parameters:
+    - path: Path of the file to hash.
+    - chunk_size: Number of bytes read per chunk.
+
+    Returns:
+    - digest: Hex SHA-256 digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def atomic_write(path, write):
+    """
+    Write a file through a temporary sibling and move it into place.
+
+    Readers (e.g. other workers) never see a partially written file.
+
+    Parameters:
+    - path: Final path of the file.
+    - write: Callable receiving the temporary path to write to.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_frames(frames, directory):
+    """
+    Store DataFrames as Parquet files in a directory.
+
+    Parameters:
+    - frames: Dict of name -> DataFrame.
+    - directory: Directory to write <name>.parquet files to.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, frame in frames.items():
+        atomic_write(
+            os.path.join(directory, f"{name}.parquet"),
+            lambda tmp_path, frame=frame: frame.to_parquet(tmp_path, engine="pyarrow"),
+        )
+
+
+def read_frames(names, directory):
+    """
+    Load DataFrames stored by write_frames.
+
+    Parameters:
+    - names: Names of the frames to load.
+    - directory: Directory holding the <name>.parquet files.
+
+    Returns:
+    - frames: Dict of name -> DataFrame, or None if any file is missing.
+    """
+    paths = {name: os.path.join(directory, f"{name}.parquet") for name in names}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+    return {
+        name: pd.read_parquet(path, engine="pyarrow") for name, path in paths.items()
+    }
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(cache_dir, manifest):
+    def write(tmp_path):
+        with open(tmp_path, "w") as file:
+            json.dump(manifest, file)
+
+    atomic_write(os.path.join(cache_dir, MANIFEST_NAME), write)
+
+
+def load_workbook_data(path=DATA_PATH, cache_dir=None):
+    """
+    Load the "Deal Data" and "AE Data" sheets, serving them from a Parquet cache.
+
+    The workbook is parsed in a single pass and both sheets are cached under
+    the SHA-256 of the source file. A matching mtime and size skip the hash
+    entirely; a touched but unchanged file is recognised by its hash.
+
+    Parameters:
+    - path: Path of the Excel workbook.
+    - cache_dir: Directory for the cache (defaults to ".cache/workbook" next to
+      the workbook).
+
+    Returns:
+    - deal_data: DataFrame containing the raw deal information.
+    - ae_data: DataFrame containing the raw AE information.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path), ".cache", "workbook")
+
+    stat = os.stat(path)
+    manifest = _read_manifest(cache_dir)
+
+    # Fast path: the source file has not been touched since it was cached
+    if (
+        manifest is not None
+        and manifest.get("mtime_ns") == stat.st_mtime_ns
+        and manifest.get("size") == stat.st_size
+    ):
+        frames = read_frames(SHEETS, os.path.join(cache_dir, manifest["sha256"]))
+        if frames is not None:
+            return frames["deal_data"], frames["ae_data"]
+
+    # Otherwise look the contents up by hash
+    sha256 = file_sha256(path)
+    entry_dir = os.path.join(cache_dir, sha256)
+    frames = read_frames(SHEETS, entry_dir)
+
+    if frames is None:
+        # Parse both sheets in a single pass over the workbook
+        sheets = pd.read_excel(path, sheet_name=list(SHEETS.values()))
+        frames = {name: sheets[sheet] for name, sheet in SHEETS.items()}
+        try:
+            write_frames(frames, entry_dir)
+        except Exception:  # the cache is an optimisation, never a requirement
+            logger.exception("Could not cache %s, serving it uncached", path)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return frames["deal_data"], frames["ae_data"]
+
+    _write_manifest(
+        cache_dir,
+        {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256},
+    )
+
+    # Drop cache entries of previous versions of the workbook
+    for entry in os.listdir(cache_dir):
+        entry_path = os.path.join(cache_dir, entry)
+        if entry != sha256 and os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+
+    return frames["deal_data"], frames["ae_data"]
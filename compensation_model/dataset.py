@@ -0,0 +1,377 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+
+import pandas as pd
+from compensation_model.acceleratorTiers import (
+    DEFAULT_ACCELERATOR_TIERS,
+    AcceleratorTiers,
+    load_accelerator_tiers,
+)
+from compensation_model.compensationCube import (
+    CompensationCube,
+    build_compensation_cube,
+    update_compensation_cube,
+)
+from compensation_model.dataLoader import load_workbook_data
+from compensation_model.dealDeltas import (
+    append_delta,
+    delta_log_size,
+    locked_delta_log,
+    parse_delta,
+    read_deltas,
+)
+from compensation_model.exceptionRules import load_exceptions
+from compensation_model.incremental import apply_deal_delta
+from compensation_model.paymentIndex import PaymentIndex
+from compensation_model.resultCache import (
+    calculate_compensation_cached,
+    fingerprint_frame,
+)
+from compensation_model.schema import compact_frames
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    """
+    Immutable view of one version of the computed data.
+
+    Callbacks take a snapshot once and read everything through it, so a
+    reload swapping in a new snapshot never mixes two versions in one
+    request. The frames are shared and must be treated as read-only.
+
+    Attributes:
+    - version: Content address of the inputs (see calculate_compensation_cached).
+    - deal_data: DataFrame with the per-deal compensation.
+    - ae_data: DataFrame with the per-AE compensation.
+    - cube: CompensationCube of the data.
+    - loaded_at: Unix time at which the snapshot was built.
+    - exceptions: List of exceptions the data was computed with.
+    - tiers: AcceleratorTiers the data was computed with.
+    - delta_offset: Bytes of the delta log applied to the data (see
+      replay_deltas).
+    """
+
+    version: str
+    deal_data: pd.DataFrame
+    ae_data: pd.DataFrame
+    cube: CompensationCube
+    loaded_at: float = field(default_factory=time.time)
+    exceptions: list = field(default_factory=list)
+    tiers: AcceleratorTiers = DEFAULT_ACCELERATOR_TIERS
+    delta_offset: int = 0
+
+    @cached_property
+    def payment_index(self):
+        """PaymentIndex of the deal data, built on first use."""
+        return PaymentIndex(self.deal_data)
+
+
+def load_snapshot(data_path, exceptions_path, workers=1, tiers_path=None):
+    """
+    Load the workbook and exceptions and compute a DatasetSnapshot.
+
+    Parameters:
+    - data_path: Path of the Excel workbook.
+    - exceptions_path: Path of the JSON file listing the exceptions.
+    - workers: Number of worker processes for the per-AE computations (see
+      map_ae_partitions); None for one per CPU core.
+    - tiers_path: Optional path of the JSON file of accelerator tiers (see
+      load_accelerator_tiers); the default plan's tiers when omitted.
+
+    Returns:
+    - snapshot: DatasetSnapshot of the computed data.
+    """
+    deal_data, ae_data = load_workbook_data(data_path)
+    exceptions = load_exceptions(exceptions_path)
+    tiers = (
+        load_accelerator_tiers(tiers_path) if tiers_path else DEFAULT_ACCELERATOR_TIERS
+    )
+    deal_data, ae_data, version = calculate_compensation_cached(
+        deal_data, ae_data, exceptions=exceptions, workers=workers, tiers=tiers
+    )
+    deal_data, ae_data = compact_frames(deal_data, ae_data)
+    return DatasetSnapshot(
+        version=version,
+        deal_data=deal_data,
+        ae_data=ae_data,
+        cube=build_compensation_cube(deal_data, ae_data, workers=workers, tiers=tiers),
+        exceptions=exceptions,
+        tiers=tiers,
+    )
+
+
+def update_snapshot(snapshot, upserted=None, deleted=None):
+    """
+    Apply a delta of deals to a DatasetSnapshot incrementally.
+
+    Parameters:
+    - snapshot: DatasetSnapshot to update (left unmodified).
+    - upserted: DataFrame of raw deal rows replacing the rows of their
+      Opportunity_ID (see apply_deal_delta).
+    - deleted: Opportunity_IDs whose rows are removed.
+
+    Returns:
+    - snapshot: New DatasetSnapshot, versioned from the old version and the delta.
+    """
+    deal_data, ae_data, removed, added = apply_deal_delta(
+        snapshot.deal_data,
+        snapshot.ae_data,
+        snapshot.exceptions,
+        upserted=upserted,
+        deleted=deleted,
+        tiers=snapshot.tiers,
+    )
+    deal_data, ae_data = compact_frames(deal_data, ae_data)
+
+    # Chain the version so caches keyed by it never serve the old data
+    digest = hashlib.sha256(snapshot.version.encode())
+    if upserted is not None:
+        digest.update(fingerprint_frame(upserted).encode())
+    digest.update(repr(sorted(map(str, deleted or []))).encode())
+
+    return DatasetSnapshot(
+        version=digest.hexdigest(),
+        deal_data=deal_data,
+        ae_data=ae_data,
+        cube=update_compensation_cube(
+            snapshot.cube, deal_data, ae_data, removed, added, snapshot.tiers
+        ),
+        exceptions=snapshot.exceptions,
+        tiers=snapshot.tiers,
+        delta_offset=snapshot.delta_offset,
+    )
+
+
+def replay_deltas(snapshot, path):
+    """
+    Apply the deltas of a log to a DatasetSnapshot, in the order they were logged.
+
+    Only the deltas appended after the snapshot's delta_offset are applied, so
+    a snapshot computed from the workbook replays the whole log and a
+    snapshot already caught up only the new deltas.
+
+    Parameters:
+    - snapshot: DatasetSnapshot to bring up to date.
+    - path: Path of the delta log (see append_delta); None replays nothing.
+
+    Returns:
+    - snapshot: DatasetSnapshot with every logged delta applied.
+    """
+    if not path:
+        return snapshot
+    deltas, offset = read_deltas(path, snapshot.delta_offset)
+    for delta in deltas:
+        upserted, deleted = parse_delta(delta)
+        snapshot = update_snapshot(snapshot, upserted, deleted)
+    return replace(snapshot, delta_offset=offset)
+
+
+class DatasetStore:
+    """
+    Holder of the current DatasetSnapshot with background reloads.
+
+    Reloads compute a new snapshot on a background thread and publish it
+    with a single reference assignment. In-flight requests keep the
+    snapshot they already took and new requests see the new one.
+
+    Parameters:
+    - loader: Callable without arguments returning a new DatasetSnapshot,
+      with the deltas of the delta log replayed (see replay_deltas).
+    - delta_log: Optional path of the log the applied deltas are appended to.
+    """
+
+    def __init__(self, loader, delta_log=None):
+        self._loader = loader
+        self.delta_log = delta_log
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+        self.last_error = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A forked child does not inherit the thread of a reload running in
+        # the parent, so the lock that reload holds would never be released
+        self._reload_lock = threading.Lock()
+
+    @property
+    def snapshot(self):
+        """The current DatasetSnapshot."""
+        return self._snapshot
+
+    def swap(self, snapshot):
+        """
+        Publish a new snapshot atomically.
+
+        Parameters:
+        - snapshot: DatasetSnapshot replacing the current one.
+        """
+        self._snapshot = snapshot
+
+    def reload(self):
+        """
+        Compute a new snapshot and publish it, keeping the old one on failure.
+
+        Returns:
+        - reloaded: Whether a new snapshot was published.
+        """
+        with self._reload_lock:
+            return self._reload()
+
+    def _reload(self):
+        try:
+            snapshot = self._loader()
+        except Exception as error:
+            logger.exception("Dataset reload failed, keeping the current data")
+            self.last_error = repr(error)
+            return False
+        self.last_error = None
+        self.swap(snapshot)
+        logger.info("Dataset version %s is live", snapshot.version)
+        return True
+
+    def sync_deltas(self):
+        """
+        Apply the deltas other processes appended to the delta log.
+
+        Only the new deltas are applied. A log shorter than the part already
+        applied was truncated or deleted, so the data is reloaded in full.
+
+        Returns:
+        - synced: Whether a new snapshot was published.
+        """
+        with self._reload_lock:
+            if not self.delta_log or self._snapshot is None:
+                return False
+            size = delta_log_size(self.delta_log)
+            if size < self._snapshot.delta_offset:
+                return self._reload()
+            if size == self._snapshot.delta_offset:
+                return False
+            try:
+                snapshot = replay_deltas(self._snapshot, self.delta_log)
+            except Exception as error:
+                logger.exception("Delta replay failed, keeping the current data")
+                self.last_error = repr(error)
+                return False
+            self.last_error = None
+            self.swap(snapshot)
+            logger.info("Dataset version %s is live (delta log)", snapshot.version)
+            return True
+
+    def apply_delta(self, delta):
+        """
+        Apply a delta of deals to the current snapshot and publish the result.
+
+        The delta is appended to the delta log once it applies, so that the
+        next reload, and the other processes syncing the log, replay it. The
+        deltas the other processes appended before it are applied first, so
+        every process applies the logged deltas in the same order.
+
+        Parameters:
+        - delta: Decoded JSON body of the delta (see parse_delta).
+
+        Returns:
+        - snapshot: The published DatasetSnapshot.
+
+        Raises:
+        - ValueError, KeyError: If the delta is malformed or misses columns;
+          nothing is logged or published then.
+        - RuntimeError: If the log was truncated and reloading the data failed.
+        """
+        upserted, deleted = parse_delta(delta)
+        with self._reload_lock:
+            if not self.delta_log:
+                snapshot = update_snapshot(self._snapshot, upserted, deleted)
+            else:
+                with locked_delta_log(self.delta_log) as log:
+                    # The file opens at its end, so its position is the log size
+                    if log.tell() < self._snapshot.delta_offset:
+                        # The log was truncated: its deltas are in the workbook
+                        if not self._reload():
+                            raise RuntimeError(self.last_error)
+                    snapshot = replay_deltas(self._snapshot, self.delta_log)
+                    snapshot = update_snapshot(snapshot, upserted, deleted)
+                    offset = append_delta(log, delta)
+                snapshot = replace(snapshot, delta_offset=offset)
+            self.swap(snapshot)
+            logger.info("Dataset version %s is live (delta)", snapshot.version)
+            return snapshot
+
+    def reload_async(self):
+        """
+        Start a reload on a background thread unless one is already running.
+
+        Returns:
+        - started: Whether a new reload was started.
+        """
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, name="dataset-reload", daemon=True).start()
+        return True
+
+    def is_reloading(self):
+        """Whether a reload is currently running."""
+        return self._reload_lock.locked()
+
+    def watch(self, paths, interval=5.0):
+        """
+        Reload in the background whenever one of the files changes.
+
+        The delta log is not one of the files: its new deltas are applied
+        incrementally at every check instead (see sync_deltas).
+
+        Parameters:
+        - paths: Files to watch (e.g. the workbook and the exceptions file).
+        - interval: Seconds between two checks of the files.
+
+        Returns:
+        - thread: The daemon thread polling the files.
+        """
+
+        def signature():
+            stamps = []
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                    stamps.append((stat.st_mtime_ns, stat.st_size))
+                except OSError:
+                    stamps.append(None)
+            return stamps
+
+        def poll():
+            last_seen = signature()
+            while True:
+                time.sleep(interval)
+                current = signature()
+                if current != last_seen:
+                    last_seen = current
+                    self.reload()
+                else:
+                    self.sync_deltas()
+
+        thread = threading.Thread(target=poll, name="dataset-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        """
+        Describe the current state of the store.
+
+        Returns:
+        - status: Dictionary with the live version, its load time, whether a
+          reload is running and the error of the last failed reload.
+        """
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reloading": self.is_reloading(),
+            "last_error": self.last_error,
+        }
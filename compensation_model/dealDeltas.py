@@ -0,0 +1,116 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+def parse_delta(delta):
+    """
+    Validate the JSON body of a delta of deals.
+
+    Parameters:
+    - delta: Decoded JSON object with the optional "upserted" (list of deal
+      rows with the workbook's columns) and "deleted" (list of Opportunity
+      IDs) keys.
+
+    Returns:
+    - upserted: DataFrame of the upserted rows (empty when there are none).
+    - deleted: List of the deleted Opportunity IDs.
+
+    Raises:
+    - ValueError: If the delta is not an object or its keys are not lists.
+    """
+    if not isinstance(delta, dict):
+        raise ValueError("The delta must be a JSON object")
+    upserted = delta.get("upserted") or []
+    deleted = delta.get("deleted") or []
+    if not isinstance(upserted, list) or not isinstance(deleted, list):
+        raise ValueError('"upserted" and "deleted" must be lists')
+    if not all(isinstance(row, dict) for row in upserted):
+        raise ValueError('"upserted" must list objects with the deal columns')
+    return pd.DataFrame(upserted), deleted
+
+
+@contextmanager
+def locked_delta_log(path):
+    """
+    Open a delta log for appending, holding an exclusive lock on it.
+
+    Processes applying deltas take the lock in turn, so each one reads the
+    deltas appended before its own and the log order is the order in which
+    the deltas are applied.
+
+    Parameters:
+    - path: Path of the log file, created if missing.
+
+    Returns:
+    - file: The open log file, while the lock is held.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "ab") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield file
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def append_delta(file, delta):
+    """
+    Append a delta of deals to a log opened by locked_delta_log.
+
+    Parameters:
+    - file: The open log file.
+    - delta: Decoded JSON body of the delta (see parse_delta).
+
+    Returns:
+    - offset: Size of the log, in bytes, once the delta is written.
+    """
+    file.write((json.dumps(delta) + "\n").encode())
+    file.flush()
+    return file.tell()
+
+
+def delta_log_size(path):
+    """
+    Get the size of a delta log.
+
+    Parameters:
+    - path: Path of the log file.
+
+    Returns:
+    - size: Size in bytes, 0 when the log does not exist.
+    """
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def read_deltas(path, offset=0):
+    """
+    Read the deltas of a log appended after a given offset, in order.
+
+    A line still being written by another process is left for a later read.
+
+    Parameters:
+    - path: Path of the log file.
+    - offset: Size of the part of the log already read, in bytes.
+
+    Returns:
+    - deltas: List of decoded deltas (empty when the log does not exist).
+    - offset: Size of the part of the log read so far, in bytes.
+    """
+    try:
+        with open(path, "rb") as file:
+            file.seek(offset)
+            data = file.read()
+    except FileNotFoundError:
+        return [], offset
+    complete = data[: data.rfind(b"\n") + 1]
+    deltas = [json.loads(line) for line in complete.splitlines() if line.strip()]
+    return deltas, offset + len(complete)
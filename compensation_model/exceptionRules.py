@@ -0,0 +1,188 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def _index_deals(deal_data):
+    """
+    Index the first row of every opportunity by its Opportunity_ID.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+
+    Returns:
+    - first_position: Series mapping each Opportunity_ID to its first row position.
+    """
+    ids = deal_data["Opportunity_ID"]
+    first = ~ids.duplicated()
+    return pd.Series(np.flatnonzero(first.to_numpy()), index=ids[first].to_numpy())
+
+
+def apply_shared_opportunities(deal_data, rules):
+    """
+    Split shared opportunities between AEs.
+
+    The original owner keeps its share of the ACV and Services, and one row
+    per additional AE is appended with that AE's share. Every rule is
+    resolved through the Opportunity_ID index and all new rows are added
+    with a single concat.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+    - rules: List of "shared_opportunity" exceptions, each with a deal_id and
+      a shares dict of AE -> share percentage.
+
+    Returns:
+    - deal_data: DataFrame with the shares applied and the split rows appended.
+
+    Raises:
+    - ValueError: If a rule references a deal_id missing from the deal data.
+    """
+    first_position = _index_deals(deal_data)
+    unknown = [
+        rule["deal_id"] for rule in rules if rule["deal_id"] not in first_position
+    ]
+    if unknown:
+        raise ValueError(
+            f"Shared opportunities reference unknown deals: {', '.join(map(str, unknown))}"
+        )
+
+    # Collect the owner's factor per deal and the rows to add for other AEs
+    owner_factors = {}
+    split_positions, split_aes, split_shares = [], [], []
+    for rule in rules:
+        deal_id = rule["deal_id"]
+        position = first_position[deal_id]
+        owner = deal_data["AE"].iat[position]
+        for ae, share in rule["shares"].items():
+            if ae == owner:
+                owner_factors[deal_id] = owner_factors.get(deal_id, 1) * share
+            else:
+                split_positions.append(position)
+                split_aes.append(ae)
+                split_shares.append(share)
+
+    # Modify the original AE's ACV and Services in one masked multiply
+    if owner_factors:
+        factors = deal_data["Opportunity_ID"].map(owner_factors)
+        shared = factors.notna()
+        deal_data.loc[shared, ["ACV", "Services"]] = deal_data.loc[
+            shared, ["ACV", "Services"]
+        ].mul(factors[shared], axis=0)
+
+    # Add the rows of the other AEs, copied from the (already shared) original
+    if split_positions:
+        split_rows = deal_data.iloc[split_positions].copy()
+        split_rows["AE"] = split_aes
+        split_rows["ACV"] *= split_shares
+        split_rows["Services"] *= split_shares
+        deal_data = pd.concat([deal_data, split_rows], ignore_index=True)
+
+    return deal_data
+
+
+def apply_acv_adjustments(deal_data, rules):
+    """
+    Scale the ACV of specific deals.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+    - rules: List of "adjust_acv" exceptions, each with a deal_id and an
+      adjustment_factor.
+
+    Returns:
+    - deal_data: DataFrame with every adjustment applied in one multiply.
+    """
+    # Several adjustments to the same deal compound
+    factors = {}
+    for rule in rules:
+        deal_id = rule["deal_id"]
+        factors[deal_id] = factors.get(deal_id, 1) * rule["adjustment_factor"]
+
+    adjustment = deal_data["Opportunity_ID"].map(factors)
+    adjusted = adjustment.notna()
+    deal_data.loc[adjusted, "ACV"] *= adjustment[adjusted]
+    return deal_data
+
+
+def apply_close_date_payments(deal_data, rules):
+    """
+    Pay uninvoiced NOLA and SOLA upsells the month after they close.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+    - rules: List of "close_date_payment" exceptions (they take no options).
+
+    Returns:
+    - deal_data: DataFrame with the Payment_Date updated in one masked assignment.
+    """
+    eligible = (
+        deal_data["Opp_Global_Region"].isin(["NOLA", "SOLA"])
+        & (deal_data["Type"] == "Upsell")
+        & deal_data["Invoice_Date"].isna()
+    )
+    if not eligible.any():
+        return deal_data
+
+    # The last eligible row of an opportunity sets the date for all its rows
+    close_dates = (
+        deal_data.loc[eligible]
+        .drop_duplicates(subset="Opportunity_ID", keep="last")
+        .set_index("Opportunity_ID")["Close_Date"]
+    )
+    payment_dates = close_dates + pd.DateOffset(months=1)
+    matched = deal_data["Opportunity_ID"].isin(payment_dates.index)
+    deal_data.loc[matched, "Payment_Date"] = deal_data.loc[
+        matched, "Opportunity_ID"
+    ].map(payment_dates)
+    return deal_data
+
+
+# Handlers for each exception type, in the order they are applied
+EXCEPTION_HANDLERS = {
+    "shared_opportunity": apply_shared_opportunities,
+    "adjust_acv": apply_acv_adjustments,
+    "close_date_payment": apply_close_date_payments,
+}
+
+
+def load_exceptions(path):
+    """
+    Read a list of exceptions from a JSON file.
+
+    Parameters:
+    - path: Path of the JSON file holding a list of exception objects.
+
+    Returns:
+    - exceptions: List of exceptions to apply to specific deals.
+    """
+    with open(path) as file:
+        exceptions = json.load(file)
+    if not isinstance(exceptions, list):
+        raise ValueError(f"{path} must contain a list of exceptions")
+    return exceptions
+
+
+def apply_exceptions(deal_data, exceptions):
+    """
+    Apply exception rules to the deals, one batched operation per rule type.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+    - exceptions: List of exceptions to apply to specific deals. Exceptions
+      of an unknown type are ignored.
+
+    Returns:
+    - deal_data: DataFrame with all the exceptions applied.
+    """
+    # Group the rules by type
+    rules_by_type = {}
+    for exception in exceptions:
+        rules_by_type.setdefault(exception["type"], []).append(exception)
+
+    for exception_type, handler in EXCEPTION_HANDLERS.items():
+        if exception_type in rules_by_type:
+            deal_data = handler(deal_data, rules_by_type[exception_type])
+
+    return deal_data
@@ -0,0 +1,153 @@
+import pandas as pd
+from compensation_model.acceleratorTiers import DEFAULT_ACCELERATOR_TIERS
+from compensation_model.calculations import (
+    calculate_annual_accelerator,
+    calculate_deal_compensation,
+    prepare_deal_data,
+)
+
+# Per-AE aggregates of calculate_compensation that are sums over the deals
+SUMMED_COLUMNS = [
+    "New_Count",
+    "New_ACV",
+    "Upsell_Comp",
+    "New_Logo_Comp",
+    "Services_Comp",
+    "Total_Comp",
+    "ACV",
+]
+
+
+def aggregate_deals_by_ae(deal_data):
+    """
+    Sum the per-AE aggregates of a set of computed deals.
+
+    Parameters:
+    - deal_data: DataFrame with the per-deal compensation.
+
+    Returns:
+    - totals: DataFrame indexed by AE with one column per SUMMED_COLUMNS entry.
+    """
+    is_new = deal_data["Type"] == "New"
+    return (
+        deal_data.assign(
+            New_Count=is_new.astype(int),
+            New_ACV=deal_data["ACV"].where(is_new),
+        )
+        .groupby("AE", observed=True)[SUMMED_COLUMNS]
+        .sum()
+    )
+
+
+def filter_exceptions(exceptions, deal_ids):
+    """
+    Keep the exceptions that can affect the given opportunities.
+
+    Parameters:
+    - exceptions: List of exceptions to apply to specific deals.
+    - deal_ids: Set of Opportunity_IDs being recomputed.
+
+    Returns:
+    - exceptions: Exceptions targeting one of the deal_ids, plus those
+      without a deal_id (which apply to every deal).
+    """
+    return [
+        exception
+        for exception in exceptions
+        if "deal_id" not in exception or exception["deal_id"] in deal_ids
+    ]
+
+
+def apply_deal_delta(
+    deal_data,
+    ae_data,
+    exceptions,
+    upserted=None,
+    deleted=None,
+    tiers=DEFAULT_ACCELERATOR_TIERS,
+):
+    """
+    Update computed compensation with inserted, updated or deleted deals.
+
+    Only the rows of the touched opportunities are recomputed. The per-AE
+    sums are adjusted by the difference between the new and the old rows,
+    and the attainment and accelerators are re-evaluated for the AEs
+    involved only. The result matches calculate_compensation on the updated
+    deals, except for the order of the deal rows.
+
+    Parameters:
+    - deal_data: DataFrame with the per-deal compensation (left unmodified).
+    - ae_data: DataFrame with the per-AE compensation (left unmodified). Its
+      ACV_Rate column prices the recomputed deals.
+    - exceptions: List of exceptions the data was computed with.
+    - upserted: DataFrame of raw deal rows (workbook or underscore column
+      names). They replace every row sharing their Opportunity_ID.
+    - deleted: Opportunity_IDs whose rows are removed.
+    - tiers: AcceleratorTiers the data was computed with.
+
+    Returns:
+    - deal_data: DataFrame with the per-deal compensation after the delta.
+    - ae_data: DataFrame with the per-AE compensation after the delta.
+    - removed: Computed rows that were dropped.
+    - added: Computed rows that were added.
+
+    Raises:
+    - ValueError: If a shared opportunity exception references a deleted deal.
+    """
+    if upserted is not None and not upserted.empty:
+        upserted = prepare_deal_data(upserted.copy())
+        upserted_ids = set(upserted["Opportunity_ID"])
+    else:
+        upserted, upserted_ids = None, set()
+    touched_ids = upserted_ids | set(deleted or [])
+
+    # Deleting a shared opportunity would fail on a full recompute as well
+    orphaned = sorted(
+        str(exception["deal_id"])
+        for exception in exceptions
+        if exception.get("type") == "shared_opportunity"
+        and exception["deal_id"] in touched_ids - upserted_ids
+    )
+    if orphaned:
+        raise ValueError(
+            f"Shared opportunities reference deleted deals: {', '.join(orphaned)}"
+        )
+
+    # Recompute the touched opportunities on their own
+    is_touched = deal_data["Opportunity_ID"].isin(touched_ids)
+    removed = deal_data[is_touched]
+    if upserted is None:
+        added = removed.iloc[:0]
+    else:
+        added = calculate_deal_compensation(
+            upserted, ae_data, filter_exceptions(exceptions, upserted_ids)
+        )
+    deal_data = pd.concat([deal_data[~is_touched], added], ignore_index=True)
+
+    # Adjust the per-AE sums by the difference of the old and new rows
+    difference = aggregate_deals_by_ae(added).sub(
+        aggregate_deals_by_ae(removed), fill_value=0
+    )
+    ae_data = ae_data.copy()
+    involved = ae_data["AE"].isin(difference.index)
+    if not involved.any():
+        return deal_data, ae_data, removed, added
+
+    for column in SUMMED_COLUMNS:
+        # Keep the column's dtype (e.g. the int32 New_Count of AE_SCHEMA)
+        updated = ae_data.loc[involved, column] + ae_data.loc[involved, "AE"].map(
+            difference[column]
+        )
+        ae_data.loc[involved, column] = updated.astype(ae_data[column].dtype)
+
+    # Re-evaluate the attainment and accelerators of the involved AEs
+    ae_data.loc[involved, "Attainment"] = (
+        ae_data.loc[involved, "New_ACV"] / ae_data.loc[involved, "Quota"]
+    )
+    accelerators = calculate_annual_accelerator(ae_data.loc[involved], tiers)
+    ae_data.loc[involved, "Total_Comp"] += (
+        accelerators - ae_data.loc[involved, "Accelerator_Bonus_Annual"]
+    )
+    ae_data.loc[involved, "Accelerator_Bonus_Annual"] = accelerators
+
+    return deal_data, ae_data, removed, added
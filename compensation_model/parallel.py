@@ -0,0 +1,133 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from compensation_model.acceleratorTiers import DEFAULT_ACCELERATOR_TIERS
+from compensation_model.calculations import (
+    aggregate_ae_compensation,
+    calculate_deal_compensation,
+    prepare_ae_data,
+    prepare_deal_data,
+)
+
+# Inputs with fewer deals are computed serially, as starting the worker
+# processes and shipping the partitions to them would cost more than it saves
+PARALLEL_MIN_DEALS = 200_000
+
+
+def resolve_workers(workers):
+    """
+    Resolve a worker count setting.
+
+    Parameters:
+    - workers: Number of worker processes; None or 0 for one per CPU core.
+
+    Returns:
+    - workers: The number of worker processes to use (at least 1).
+    """
+    return max(1, workers or os.cpu_count() or 1)
+
+
+def partition_aes(deal_data, ae_data, partitions):
+    """
+    Split the AEs into partitions holding a similar number of deals.
+
+    Parameters:
+    - deal_data: DataFrame with the final deal -> AE assignment.
+    - ae_data: DataFrame containing AE information.
+    - partitions: Number of partitions.
+
+    Returns:
+    - groups: List of Index of AEs, one per non-empty partition.
+    """
+    aes = pd.Index(ae_data["AE"].unique())
+    deal_counts = (
+        deal_data["AE"].value_counts().reindex(aes, fill_value=0).sort_values()
+    )
+
+    # Give the AE with the most deals to the least loaded partition first
+    loads = [(0, partition) for partition in range(partitions)]
+    groups = [[] for _ in range(partitions)]
+    for ae, count in reversed(list(deal_counts.items())):
+        load, partition = heapq.heappop(loads)
+        groups[partition].append(ae)
+        heapq.heappush(loads, (load + count, partition))
+
+    return [pd.Index(group, dtype=aes.dtype) for group in groups if group]
+
+
+def map_ae_partitions(function, deal_data, ae_data, workers=1):
+    """
+    Apply a per-AE computation to partitions of the AEs in worker processes.
+
+    The function must only combine the deals and AE rows of the AEs it is
+    given, so that its results for disjoint sets of AEs can be concatenated.
+
+    Parameters:
+    - function: Picklable callable taking (deal_data, ae_data) of a partition.
+    - deal_data: DataFrame with the final deal -> AE assignment.
+    - ae_data: DataFrame containing AE information.
+    - workers: Number of worker processes (see resolve_workers). Inputs
+      below PARALLEL_MIN_DEALS deals are computed serially.
+
+    Returns:
+    - results: List of the function's results, one per partition.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1 or len(deal_data) < PARALLEL_MIN_DEALS:
+        return [function(deal_data, ae_data)]
+
+    partitions = [
+        (deal_data[deal_data["AE"].isin(aes)], ae_data[ae_data["AE"].isin(aes)])
+        for aes in partition_aes(deal_data, ae_data, workers)
+    ]
+    if len(partitions) == 1:
+        return [function(deal_data, ae_data)]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(partitions))) as executor:
+        futures = [executor.submit(function, deals, aes) for deals, aes in partitions]
+        return [future.result() for future in futures]
+
+
+def calculate_compensation_parallel(
+    deal_data, ae_data, exceptions, workers=None, tiers=DEFAULT_ACCELERATOR_TIERS
+):
+    """
+    Calculate compensation like calculate_compensation, across CPU cores.
+
+    The per-deal compensation and the exceptions, which settle the final
+    deal -> AE assignment, are computed once. The per-AE aggregation and
+    accelerators then run on partitions of the AEs in worker processes and
+    the partial AE data are merged back in their original order.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+    - ae_data: DataFrame containing AE information (base salary, quota, etc.).
+    - exceptions: List of exceptions to apply to specific deals.
+    - workers: Number of worker processes (see resolve_workers).
+    - tiers: AcceleratorTiers of the plan.
+
+    Returns:
+    - deal_data: DataFrame with the per-deal compensation.
+    - ae_data: DataFrame with the per-AE compensation.
+    """
+    deal_data = prepare_deal_data(deal_data)
+    ae_data = prepare_ae_data(ae_data)
+    deal_data = calculate_deal_compensation(deal_data, ae_data, exceptions)
+
+    # Remember the row order, which the partitions do not preserve
+    ae_data = ae_data.assign(_position=np.arange(len(ae_data)))
+    partitions = map_ae_partitions(
+        partial(aggregate_ae_compensation, tiers=tiers), deal_data, ae_data, workers
+    )
+    ae_data = (
+        pd.concat(partitions)
+        .sort_values("_position")
+        .drop(columns="_position")
+        .reset_index(drop=True)
+    )
+
+    return deal_data, ae_data
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+# Measures paid on the deal's Payment_Date
+PAYMENT_METRICS = ["Upsell_Comp", "New_Logo_Comp", "ACV", "New_Count"]
+
+# Measures paid on the services payment date
+SERVICE_METRICS = ["Services_Comp"]
+
+
+def payment_dates(deal_data):
+    """
+    Get the dates on which the compensation of each deal is paid.
+
+    Parameters:
+    - deal_data: DataFrame with the per-deal compensation.
+
+    Returns:
+    - dates: Dictionary with the "payment" (Payment_Date) and "service"
+      (one month after the close date) dates of every deal.
+    """
+    return {
+        "payment": deal_data["Payment_Date"],
+        "service": deal_data["Close_Date"] + pd.DateOffset(months=1),
+    }
+
+
+def period_bounds(year, month=None):
+    """
+    Get the date window of a year or a month.
+
+    Parameters:
+    - year: Year of the period.
+    - month: Optional month (1-12); the whole year when omitted.
+
+    Returns:
+    - start: First day of the period.
+    - end: First day after the period.
+    """
+    start = pd.Timestamp(year=year, month=month or 1, day=1)
+    return start, start + pd.DateOffset(months=1 if month else 12)
+
+
+def _to_datetime64(date):
+    return pd.Timestamp(date).as_unit("ns").to_datetime64()
+
+
+class PaymentIndex:
+    """
+    Deals sorted by payment and service date, for lookups by binary search.
+
+    Any date window (a month, a quarter, a fiscal year, ...) is found with
+    two searchsorted calls, so selecting its k deals costs O(log n + k)
+    instead of evaluating a mask over every deal.
+
+    Parameters:
+    - deal_data: DataFrame with the per-deal compensation. The positions
+      returned by the index are row positions in this frame.
+    """
+
+    def __init__(self, deal_data):
+        self._dates = {}
+        self._positions = {}
+        for kind, dates in payment_dates(deal_data).items():
+            dates = dates.to_numpy(dtype="datetime64[ns]")
+            # Deals without a date are never paid
+            valid = np.flatnonzero(~np.isnat(dates))
+            order = valid[np.argsort(dates[valid], kind="stable")]
+            self._dates[kind] = dates[order]
+            self._positions[kind] = order
+
+    def positions(self, start=None, end=None, kind="payment"):
+        """
+        Find the deals paid within a date window.
+
+        Parameters:
+        - start: First date of the window (inclusive); unbounded when None.
+        - end: End of the window (exclusive); unbounded when None.
+        - kind: "payment" or "service" (see payment_dates).
+
+        Returns:
+        - positions: Row positions of the deals, ordered by date.
+        """
+        dates = self._dates[kind]
+        # Convert through Timestamp, which keeps the nanoseconds of the bounds
+        low = 0 if start is None else dates.searchsorted(_to_datetime64(start))
+        high = len(dates) if end is None else dates.searchsorted(_to_datetime64(end))
+        return self._positions[kind][low:high]
+
+    def window(self, deal_data, start=None, end=None, kind="payment"):
+        """
+        Select the deals paid within a date window.
+
+        Parameters:
+        - deal_data: The DataFrame the index was built from.
+        - start, end, kind: As in positions.
+
+        Returns:
+        - deals: DataFrame with the rows of the deals, ordered by date.
+        """
+        return deal_data.iloc[self.positions(start, end, kind)]
+
+    def totals(self, deal_data, start=None, end=None):
+        """
+        Aggregate the compensation paid to every AE within a date window.
+
+        Parameters:
+        - deal_data: The DataFrame the index was built from.
+        - start, end: As in positions.
+
+        Returns:
+        - totals: DataFrame indexed by AE with the PAYMENT_METRICS summed
+          over the deals paid in the window and the SERVICE_METRICS over the
+          services paid in it. AEs paid nothing are left out.
+        """
+        paid = self.window(deal_data, start, end)
+        serviced = self.window(deal_data, start, end, kind="service")
+        totals = (
+            paid.assign(New_Count=(paid["Type"] == "New").astype(int))
+            .groupby("AE", observed=True)[PAYMENT_METRICS]
+            .sum()
+        )
+        services = serviced.groupby("AE", observed=True)[SERVICE_METRICS].sum()
+        return totals.join(services, how="outer").fillna(0)
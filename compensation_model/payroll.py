@@ -0,0 +1,140 @@
+import argparse
+import os
+import time
+
+from compensation_model.sharedDataset import load_dataset_snapshot
+
+# Columns of the payroll table, in order
+PAYROLL_COLUMNS = [
+    "AE",
+    "Year",
+    "Month",
+    "Base_Salary",
+    "Upsell_Comp",
+    "New_Logo_Comp",
+    "Services_Comp",
+    "Accelerator_Bonus",
+    "Accelerator_Bonus_Annual",
+    "Total_Comp",
+    "ACV",
+]
+
+# Output formats, by file extension
+PAYROLL_FORMATS = {".parquet": "parquet", ".csv": "csv"}
+
+
+def payroll_table(snapshot):
+    """
+    Lay out the compensation of every AE for every month of the data.
+
+    The periods come from the snapshot's CompensationCube in one pass: deal
+    compensation is reported in the month it is paid and the monthly
+    accelerators in the month after they are earned. The base salary is paid
+    monthly, and the annual accelerator, settled on the whole data, in the
+    last month covered. Total_Comp adds them up like the AE Compensation
+    page, which reports the monthly accelerators without adding them.
+
+    Parameters:
+    - snapshot: DatasetSnapshot of the computed data.
+
+    Returns:
+    - payroll: DataFrame with one row per AE, Year and Month and the
+      PAYROLL_COLUMNS.
+    """
+    payroll = snapshot.cube.to_frame()
+    ae_data = snapshot.ae_data.drop_duplicates(subset="AE").set_index("AE")
+    ae = payroll["AE"].astype(object)
+
+    payroll["Base_Salary"] = ae.map(ae_data["Base_Salary_Annual"]).fillna(0) / 12
+    last_period = (payroll["Year"] == payroll["Year"].max()) & (payroll["Month"] == 12)
+    payroll["Accelerator_Bonus_Annual"] = (
+        ae.map(ae_data["Accelerator_Bonus_Annual"]).fillna(0).where(last_period, 0)
+    )
+    payroll["Total_Comp"] = payroll[
+        [
+            "Base_Salary",
+            "Upsell_Comp",
+            "New_Logo_Comp",
+            "Services_Comp",
+            "Accelerator_Bonus_Annual",
+        ]
+    ].sum(axis=1)
+
+    return payroll[PAYROLL_COLUMNS]
+
+
+def write_payroll(payroll, path, output_format=None):
+    """
+    Write a payroll table to a Parquet or CSV file.
+
+    Parameters:
+    - payroll: DataFrame returned by payroll_table.
+    - path: Path of the output file.
+    - output_format: "parquet" or "csv"; inferred from the extension of the
+      path when omitted.
+
+    Raises:
+    - ValueError: If the format is not given and cannot be inferred.
+    """
+    if output_format is None:
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in PAYROLL_FORMATS:
+            raise ValueError(f"Cannot infer the output format of {path}")
+        output_format = PAYROLL_FORMATS[extension]
+
+    if output_format == "parquet":
+        payroll.to_parquet(path, index=False)
+    else:
+        payroll.to_csv(path, index=False)
+
+
+def main():
+    """Compute the payroll of every AE and month without the dashboard."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("output", help="Output file (.parquet or .csv)")
+    parser.add_argument(
+        "--data", default="./data/compensationModelTaskData.xlsx", help="Workbook"
+    )
+    parser.add_argument(
+        "--exceptions", default="./config/exceptions.json", help="Exceptions file"
+    )
+    parser.add_argument(
+        "--tiers", default="./config/acceleratorTiers.json", help="Accelerator tiers"
+    )
+    parser.add_argument(
+        "--delta-log", default="./data/dealDeltas.jsonl", help="Deal delta log"
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(set(PAYROLL_FORMATS.values())),
+        help="Output format (default: from the output extension)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for the computation (0 for one per CPU core)",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    snapshot = load_dataset_snapshot(
+        args.data,
+        args.exceptions,
+        tiers_path=args.tiers,
+        delta_log_path=args.delta_log,
+        workers=args.workers,
+    )
+    payroll = payroll_table(snapshot)
+    try:
+        write_payroll(payroll, args.output, args.format)
+    except ValueError as error:
+        parser.error(str(error))
+    print(
+        f"Wrote {len(payroll)} payroll rows of dataset version {snapshot.version} "
+        f"to {args.output} in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import pandas as pd
+from compensation_model.acceleratorTiers import DEFAULT_ACCELERATOR_TIERS
+from compensation_model.calculations import calculate_compensation
+from compensation_model.dataLoader import read_frames, write_frames
+from compensation_model.parallel import calculate_compensation_parallel
+
+logger = logging.getLogger(__name__)
+
+RESULTS_CACHE_DIR = "./data/.cache/results"
+
+# Bump whenever calculate_compensation changes its outputs for the same inputs
+CACHE_FORMAT_VERSION = 2
+
+RESULT_FRAMES = ["deal_data", "ae_data"]
+
+
+def fingerprint_frame(frame):
+    """
+    Fingerprint a DataFrame's columns, dtypes, index and values.
+
+    Parameters:
+    - frame: DataFrame to fingerprint.
+
+    Returns:
+    - digest: Hex SHA-256 digest of the frame.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(list(frame.columns)).encode())
+    digest.update(repr([str(dtype) for dtype in frame.dtypes]).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint_exceptions(exceptions):
+    """
+    Fingerprint an exceptions list through a canonical JSON serialization.
+
+    Parameters:
+    - exceptions: List of exceptions to apply to specific deals.
+
+    Returns:
+    - digest: Hex SHA-256 digest of the exceptions.
+    """
+    canonical = json.dumps(
+        exceptions, sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def compensation_cache_key(
+    deal_data, ae_data, exceptions, tiers=DEFAULT_ACCELERATOR_TIERS
+):
+    """
+    Build the content address of a calculate_compensation run.
+
+    Parameters:
+    - deal_data: DataFrame containing the raw deal information.
+    - ae_data: DataFrame containing the raw AE information.
+    - exceptions: List of exceptions to apply to specific deals.
+    - tiers: AcceleratorTiers of the plan.
+
+    Returns:
+    - key: Hex SHA-256 digest identifying the inputs.
+    """
+    digest = hashlib.sha256(f"v{CACHE_FORMAT_VERSION}".encode())
+    for part in (
+        fingerprint_frame(deal_data),
+        fingerprint_frame(ae_data),
+        fingerprint_exceptions(exceptions),
+        fingerprint_exceptions(tiers.tables),
+    ):
+        digest.update(part.encode())
+    return digest.hexdigest()
+
+
+def _prune(cache_dir, max_entries):
+    entries = [
+        os.path.join(cache_dir, entry)
+        for entry in os.listdir(cache_dir)
+        if os.path.isdir(os.path.join(cache_dir, entry))
+    ]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for entry in entries[max_entries:]:
+        shutil.rmtree(entry, ignore_errors=True)
+
+
+def calculate_compensation_cached(
+    deal_data,
+    ae_data,
+    exceptions,
+    cache_dir=RESULTS_CACHE_DIR,
+    max_entries=8,
+    workers=1,
+    tiers=DEFAULT_ACCELERATOR_TIERS,
+):
+    """
+    Run calculate_compensation, reusing stored results for identical inputs.
+
+    Parameters:
+    - deal_data: DataFrame containing the raw deal information.
+    - ae_data: DataFrame containing the raw AE information.
+    - exceptions: List of exceptions to apply to specific deals.
+    - cache_dir: Directory of the content-addressed result store.
+    - max_entries: Number of most recent results kept in the store.
+    - workers: Number of worker processes computing a missing result (see
+      calculate_compensation_parallel); 1 computes it in this process.
+    - tiers: AcceleratorTiers of the plan.
+
+    Returns:
+    - deal_data: DataFrame with the per-deal compensation.
+    - ae_data: DataFrame with the per-AE compensation.
+    - key: Content address of the inputs, usable as a dataset version.
+    """
+    key = compensation_cache_key(deal_data, ae_data, exceptions, tiers)
+    entry_dir = os.path.join(cache_dir, key)
+
+    frames = read_frames(RESULT_FRAMES, entry_dir)
+    if frames is not None:
+        return frames["deal_data"], frames["ae_data"], key
+
+    if workers == 1:
+        deal_data, ae_data = calculate_compensation(
+            deal_data, ae_data, exceptions, tiers
+        )
+    else:
+        deal_data, ae_data = calculate_compensation_parallel(
+            deal_data, ae_data, exceptions, workers=workers, tiers=tiers
+        )
+    try:
+        write_frames({"deal_data": deal_data, "ae_data": ae_data}, entry_dir)
+        _prune(cache_dir, max_entries)
+    except Exception:
+        # The results just computed are still returned; dropping the partial
+        # entry only means the next load with these inputs recomputes them
+        logger.exception("Could not store compensation results for %s", key)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+
+    return deal_data, ae_data, key
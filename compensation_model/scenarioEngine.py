@@ -0,0 +1,146 @@
+import numpy as np
+from compensation_model.acceleratorTiers import DEFAULT_ACCELERATOR_TIERS
+
+# Scenarios evaluated per block, bounding the size of the scenario x AE arrays
+SCENARIO_CHUNK_SIZE = 1024
+
+
+def scenario_inputs(ae_data):
+    """
+    Extract the per-AE arrays the scenarios are evaluated on.
+
+    Parameters:
+    - ae_data: DataFrame with the per-AE compensation (see calculate_compensation).
+
+    Returns:
+    - inputs: Dictionary of NumPy arrays with one entry per AE.
+    """
+    columns = {
+        "ae": "AE",
+        "base_salary": "Base_Salary_Annual",
+        "quota": "Quota",
+        "new_acv": "New_ACV",
+        "new_count": "New_Count",
+        "upsell_comp": "Upsell_Comp",
+        "new_logo_comp": "New_Logo_Comp",
+    }
+    inputs = {key: ae_data[column].to_numpy() for key, column in columns.items()}
+    for key in inputs:
+        if key != "ae":
+            inputs[key] = inputs[key].astype(float)
+
+    # Compensation not paid at the ACV rate, taken from Total_Comp so that the
+    # baseline scenario reproduces it (deals without an ACV add no services)
+    inputs["other_comp"] = (
+        ae_data["Total_Comp"]
+        - ae_data["Accelerator_Bonus_Annual"]
+        - ae_data["Upsell_Comp"]
+        - ae_data["New_Logo_Comp"]
+    ).to_numpy(dtype=float)
+    return inputs
+
+
+def scenario_grid(
+    quota_scales, rate_scales, threshold_scales, tiers=DEFAULT_ACCELERATOR_TIERS
+):
+    """
+    Build every combination of the given quota, ACV rate and threshold scales.
+
+    Parameters:
+    - quota_scales: Factors applied to every AE's quota.
+    - rate_scales: Factors applied to every AE's ACV rate, on top of the rate
+      change implied by the new quota.
+    - threshold_scales: Factors applied to the attainment thresholds of the tiers.
+    - tiers: AcceleratorTiers of the plan, whose default thresholds are scaled.
+
+    Returns:
+    - scenarios: Dictionary with the arrays quota_scale, rate_scale and
+      thresholds (one row of tier thresholds per scenario).
+    """
+    quota_scale, rate_scale, threshold_scale = (
+        grid.ravel()
+        for grid in np.meshgrid(
+            np.asarray(quota_scales, dtype=float),
+            np.asarray(rate_scales, dtype=float),
+            np.asarray(threshold_scales, dtype=float),
+            indexing="ij",
+        )
+    )
+    return {
+        "quota_scale": quota_scale,
+        "rate_scale": rate_scale,
+        "thresholds": threshold_scale[:, np.newaxis] * tiers.arrays()[0],
+    }
+
+
+def evaluate_scenarios(
+    inputs, scenarios, chunk_size=SCENARIO_CHUNK_SIZE, tiers=DEFAULT_ACCELERATOR_TIERS
+):
+    """
+    Evaluate the payout of many plan variants over the scenario x AE matrix.
+
+    The ACV rate of an AE is Base_Salary_Annual / Quota, so upsell and new logo
+    compensation scale with rate_scale / quota_scale. Attainment is New_ACV over
+    the scaled quota and the accelerator tiers are matched against each
+    scenario's thresholds. Exceptions are already part of the per-AE inputs.
+
+    Parameters:
+    - inputs: Per-AE arrays returned by scenario_inputs.
+    - scenarios: Dictionary of per-scenario arrays (see scenario_grid).
+    - chunk_size: Number of scenarios evaluated per block.
+    - tiers: AcceleratorTiers of the plan (its default table applies).
+
+    Returns:
+    - results: Dictionary of arrays with one entry per scenario: total_payout
+      (base salary and variable compensation), variable_comp,
+      accelerator_bonus and accelerated_aes (AEs unlocking a tier).
+    """
+    quota_scale = np.asarray(scenarios["quota_scale"], dtype=float)
+    rate_scale = np.asarray(scenarios["rate_scale"], dtype=float)
+    tier_thresholds = tiers.arrays()[0]
+    thresholds = np.broadcast_to(
+        np.asarray(scenarios.get("thresholds", tier_thresholds), dtype=float),
+        (quota_scale.size, tier_thresholds.size),
+    )
+
+    commission = inputs["upsell_comp"] + inputs["new_logo_comp"]
+    base_salary = np.nansum(inputs["base_salary"])
+    other_comp = np.nansum(inputs["other_comp"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        base_attainment = inputs["new_acv"] / inputs["quota"]
+
+    results = {
+        name: np.empty(quota_scale.size)
+        for name in [
+            "total_payout",
+            "variable_comp",
+            "accelerator_bonus",
+            "accelerated_aes",
+        ]
+    }
+    for start in range(0, quota_scale.size, chunk_size):
+        block = slice(start, start + chunk_size)
+        rate_factor = (rate_scale[block] / quota_scale[block])[:, np.newaxis]
+
+        # Scenario x AE attainment and the multiplier of the unlocked tier
+        with np.errstate(divide="ignore", invalid="ignore"):
+            attainment = base_attainment / quota_scale[block, np.newaxis]
+        multiplier = tiers.multiplier(
+            attainment,
+            inputs["new_count"],
+            thresholds=thresholds[block].T[..., np.newaxis],
+        )
+
+        accelerator = np.nansum(
+            inputs["new_logo_comp"] * rate_factor * multiplier, axis=1
+        )
+        variable = (
+            np.nansum(commission * rate_factor, axis=1) + other_comp + accelerator
+        )
+
+        results["accelerator_bonus"][block] = accelerator
+        results["variable_comp"][block] = variable
+        results["total_payout"][block] = variable + base_salary
+        results["accelerated_aes"][block] = (multiplier > 0).sum(axis=1)
+
+    return results
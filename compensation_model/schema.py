@@ -0,0 +1,49 @@
+# Compact dtypes of the computed deal data: low-cardinality labels become
+# categoricals and the opportunity IDs Arrow-backed strings
+DEAL_SCHEMA = {
+    "Opportunity_ID": "string[pyarrow]",
+    "AE": "category",
+    "Type": "category",
+    "Market": "category",
+    "Opp_Global_Region": "category",
+    "Lead_Source": "category",
+}
+
+# Compact dtypes of the computed AE data
+AE_SCHEMA = {
+    "New_Count": "int32",
+}
+
+
+def apply_schema(frame, schema):
+    """
+    Convert the columns of a frame to the dtypes of a schema.
+
+    Parameters:
+    - frame: DataFrame to convert (left unmodified).
+    - schema: Dictionary of column name -> dtype. Columns missing from the
+      frame are skipped.
+
+    Returns:
+    - frame: DataFrame with the converted columns.
+    """
+    dtypes = {
+        column: dtype
+        for column, dtype in schema.items()
+        if column in frame.columns and frame[column].dtype != dtype
+    }
+    return frame.astype(dtypes) if dtypes else frame
+
+
+def compact_frames(deal_data, ae_data):
+    """
+    Convert the computed deal and AE data to their compact dtypes.
+
+    Parameters:
+    - deal_data: DataFrame with the per-deal compensation.
+    - ae_data: DataFrame with the per-AE compensation.
+
+    Returns:
+    - deal_data, ae_data: The frames with the DEAL_SCHEMA and AE_SCHEMA dtypes.
+    """
+    return apply_schema(deal_data, DEAL_SCHEMA), apply_schema(ae_data, AE_SCHEMA)
@@ -0,0 +1,326 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from compensation_model.acceleratorTiers import DEFAULT_TIERS, AcceleratorTiers
+from compensation_model.compensationCube import CompensationCube
+from compensation_model.dataLoader import atomic_write
+from compensation_model.dataset import DatasetSnapshot, load_snapshot, replay_deltas
+
+# Pointer to the published version inside the shared directory
+CURRENT_NAME = "current.json"
+
+# Field metadata marking int64 columns that hold datetime64[ns] values
+DATETIME_METADATA = {b"pandas_dtype": b"datetime64[ns]"}
+
+
+def source_key(paths):
+    """
+    Identify the inputs of a snapshot from their modification times and sizes.
+
+    Parameters:
+    - paths: Input files of the snapshot (workbook, exceptions, ...); a
+      missing file, such as an empty delta log, counts as its own signature.
+
+    Returns:
+    - key: Hex SHA-256 digest of the files' stat signatures.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            digest.update(f"{path}:missing;".encode())
+            continue
+        digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    return digest.hexdigest()
+
+
+def _frame_to_arrow(frame):
+    # Floats keep NaN and datetimes are stored as raw int64 values, so no
+    # validity bitmap is needed and workers can map the buffers as they are
+    arrays, fields = [], []
+    for name, column in frame.items():
+        name = str(name)
+        if pd.api.types.is_float_dtype(column.dtype):
+            array = pa.array(column.to_numpy(), from_pandas=False)
+            field = pa.field(name, array.type)
+        elif column.dtype == np.dtype("datetime64[ns]"):
+            array = pa.array(column.to_numpy().view("i8"))
+            field = pa.field(name, array.type, metadata=DATETIME_METADATA)
+        else:
+            array = pa.array(column, from_pandas=True)
+            field = pa.field(name, array.type)
+        arrays.append(array)
+        fields.append(field)
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _column_to_pandas(field, column):
+    chunks = column.chunks
+    is_primitive = pa.types.is_floating(field.type) or pa.types.is_integer(field.type)
+    if len(chunks) == 1 and is_primitive and column.null_count == 0:
+        # Zero-copy, read-only view of the mapped buffer
+        values = chunks[0].to_numpy(zero_copy_only=True)
+        if field.metadata == DATETIME_METADATA:
+            values = values.view("datetime64[ns]")
+        return pd.Series(values, copy=False)
+    is_string = pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+    if is_string and column.null_count == 0:
+        # Arrow-backed strings wrap the mapped buffers as well
+        return pd.Series(pd.arrays.ArrowStringArray(column))
+    return column.to_pandas()
+
+
+def _map_frame(path):
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return pd.DataFrame(
+        {
+            field.name: _column_to_pandas(field, table.column(field.name))
+            for field in table.schema
+        },
+        copy=False,
+    )
+
+
+def publish_snapshot(snapshot, directory, key):
+    """
+    Materialize a DatasetSnapshot as memory-mappable files.
+
+    The frames are written as uncompressed Arrow (Feather v2) files and the
+    cube as a .npy array under <directory>/<version>. The version becomes
+    visible to attach_snapshot once every file is in place.
+
+    Parameters:
+    - snapshot: DatasetSnapshot to publish.
+    - directory: Shared directory, ideally on a tmpfs such as /dev/shm.
+    - key: source_key of the inputs the snapshot was computed from.
+    """
+    version_dir = os.path.join(directory, snapshot.version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    for name in ("deal_data", "ae_data"):
+        table = _frame_to_arrow(getattr(snapshot, name))
+        atomic_write(
+            os.path.join(version_dir, f"{name}.arrow"),
+            lambda tmp_path, table=table: feather.write_feather(
+                table, tmp_path, compression="uncompressed"
+            ),
+        )
+
+    def write_cube(tmp_path):
+        with open(tmp_path, "wb") as file:
+            np.save(file, snapshot.cube.values)
+
+    atomic_write(os.path.join(version_dir, "cube.npy"), write_cube)
+
+    def write_current(tmp_path):
+        with open(tmp_path, "w") as file:
+            json.dump(
+                {
+                    "version": snapshot.version,
+                    "source_key": key,
+                    "loaded_at": snapshot.loaded_at,
+                    "cube_aes": [
+                        None if pd.isna(ae) else ae for ae in snapshot.cube.aes
+                    ],
+                    "cube_years": [int(year) for year in snapshot.cube.years],
+                    "exceptions": snapshot.exceptions,
+                    "accelerator_tiers": snapshot.tiers.tables,
+                    "delta_offset": snapshot.delta_offset,
+                },
+                file,
+            )
+
+    atomic_write(os.path.join(directory, CURRENT_NAME), write_current)
+
+    # Drop older versions; workers still mapping them keep their pages alive
+    for entry in os.listdir(directory):
+        entry_path = os.path.join(directory, entry)
+        if entry != snapshot.version and os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+
+
+def _read_current(directory):
+    try:
+        with open(os.path.join(directory, CURRENT_NAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def attach_snapshot(directory):
+    """
+    Map the published DatasetSnapshot read-only and without copying.
+
+    Numeric, datetime and null-free string columns share the pages of the
+    mapped files, so all workers attached to a directory hold a single copy.
+
+    Parameters:
+    - directory: Shared directory written by publish_snapshot.
+
+    Returns:
+    - snapshot: The mapped DatasetSnapshot, or None if nothing is published.
+    - key: source_key the snapshot was computed from, or None.
+    """
+    current = _read_current(directory)
+    if current is None:
+        return None, None
+
+    version_dir = os.path.join(directory, current["version"])
+    try:
+        cube = CompensationCube(
+            aes=pd.Index(current["cube_aes"]),
+            years=pd.Index(current["cube_years"]),
+            values=np.load(os.path.join(version_dir, "cube.npy"), mmap_mode="r"),
+        )
+        snapshot = DatasetSnapshot(
+            version=current["version"],
+            deal_data=_map_frame(os.path.join(version_dir, "deal_data.arrow")),
+            ae_data=_map_frame(os.path.join(version_dir, "ae_data.arrow")),
+            cube=cube,
+            loaded_at=current["loaded_at"],
+            exceptions=current.get("exceptions", []),
+            tiers=AcceleratorTiers(
+                current.get("accelerator_tiers", {"default": DEFAULT_TIERS})
+            ),
+            delta_offset=current.get("delta_offset", 0),
+        )
+    except FileNotFoundError:
+        # The version was replaced by a newer one while we were reading it
+        return None, None
+    return snapshot, current["source_key"]
+
+
+@contextmanager
+def _exclusive_lock(directory):
+    with open(os.path.join(directory, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_shared_snapshot(directory, paths, loader):
+    """
+    Attach to the shared snapshot of the inputs, computing it at most once.
+
+    The first process to find the published snapshot missing or stale
+    computes and publishes it under a file lock; every other process waits
+    for the lock and then maps the published files.
+
+    Parameters:
+    - directory: Shared directory, ideally on a tmpfs such as /dev/shm.
+    - paths: Input files of the snapshot, used to detect stale versions.
+    - loader: Callable without arguments returning a new DatasetSnapshot.
+
+    Returns:
+    - snapshot: The mapped DatasetSnapshot.
+    """
+    os.makedirs(directory, exist_ok=True)
+    key = source_key(paths)
+
+    snapshot, published_key = attach_snapshot(directory)
+    if snapshot is not None and published_key == key:
+        return snapshot
+
+    with _exclusive_lock(directory):
+        # Another process may have published while we waited for the lock
+        snapshot, published_key = attach_snapshot(directory)
+        if snapshot is None or published_key != key:
+            publish_snapshot(loader(), directory, key)
+            snapshot, _ = attach_snapshot(directory)
+
+    return snapshot
+
+
+def load_dataset_snapshot(
+    data_path,
+    exceptions_path,
+    tiers_path=None,
+    delta_log_path=None,
+    workers=1,
+    shared_dir=None,
+):
+    """
+    Load the dataset the way the dashboard serves it.
+
+    The snapshot is computed from the inputs with the delta log replayed on
+    top, and shared through shared_dir when given. The dashboard and the
+    command-line tools go through this function, so they key and compute
+    the shared snapshot the same way.
+
+    Parameters:
+    - data_path: Path of the Excel workbook.
+    - exceptions_path: Path of the JSON file listing the exceptions.
+    - tiers_path: Optional path of the JSON file of accelerator tiers.
+    - delta_log_path: Optional path of the delta log (see replay_deltas).
+    - workers: Number of worker processes for the per-AE computations.
+    - shared_dir: Optional shared directory (see load_shared_snapshot).
+
+    Returns:
+    - snapshot: DatasetSnapshot of the data.
+    """
+
+    def compute():
+        snapshot = load_snapshot(
+            data_path, exceptions_path, workers=workers, tiers_path=tiers_path
+        )
+        return replay_deltas(snapshot, delta_log_path)
+
+    if shared_dir is None:
+        return compute()
+    paths = [
+        path
+        for path in (data_path, exceptions_path, tiers_path, delta_log_path)
+        if path
+    ]
+    return load_shared_snapshot(shared_dir, paths, compute)
+
+
+def main():
+    """Publish the shared snapshot ahead of starting the web workers."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("shared_dir", help="Shared directory, e.g. /dev/shm/comp")
+    parser.add_argument(
+        "--data", default="./data/compensationModelTaskData.xlsx", help="Workbook"
+    )
+    parser.add_argument(
+        "--exceptions", default="./config/exceptions.json", help="Exceptions file"
+    )
+    parser.add_argument(
+        "--tiers", default="./config/acceleratorTiers.json", help="Accelerator tiers"
+    )
+    parser.add_argument(
+        "--delta-log", default="./data/dealDeltas.jsonl", help="Deal delta log"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Worker processes for the computation (0 for one per CPU core)",
+    )
+    args = parser.parse_args()
+
+    snapshot = load_dataset_snapshot(
+        args.data,
+        args.exceptions,
+        tiers_path=args.tiers,
+        delta_log_path=args.delta_log,
+        workers=args.workers,
+        shared_dir=args.shared_dir,
+    )
+    print(f"Published dataset version {snapshot.version} in {args.shared_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import gc
+import os
+import shutil
+import tempfile
+
+# Serve the Flask server of the Dash app
+wsgi_app = "app:server"
+bind = os.environ.get("COMPENSATION_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("COMPENSATION_THREADS", 4))
+timeout = 120
+
+# Every worker keeps its own metrics, so they write them to a directory of
+# this server and /metrics, whichever worker answers it, reports their sum
+default_metrics_dir = "COMPENSATION_METRICS_DIR" not in os.environ
+metrics_dir = os.environ.setdefault(
+    "COMPENSATION_METRICS_DIR",
+    os.path.join(tempfile.gettempdir(), f"compensation-metrics-{os.getpid()}"),
+)
+
+# Import app.py, and therefore compute the data, once in the master before
+# forking, so the workers share it copy-on-write. A background warmup
+# (COMPENSATION_WARMUP=background) would run on a thread of the master, which
+# the workers do not inherit, so every worker then imports the app and loads
+# the data on its own thread instead
+preload_app = os.environ.get("COMPENSATION_WARMUP", "sync") != "background"
+
+
+def pre_fork(server, worker):
+    # Keep the garbage collector from touching, and thereby copying, the
+    # pages of the objects loaded by the master
+    gc.freeze()
+
+
+def on_exit(server):
+    if default_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
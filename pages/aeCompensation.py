@@ -3,10 +3,16 @@ from dash.dependencies import Input, Output
 import plotly.express as px
 import pandas as pd
 from components.card import Card
-from compensation_model.acceleratorCalculation import calculate_monthly_accelerators
+from compensation_model.compensationCube import build_compensation_cube
+from utils.background import BACKGROUND_POLL_INTERVAL, create_background_manager
+from utils.memo import LRUCache
+from utils.metrics import instrument, stage
 
+# Summaries already computed, keyed by (dataset version, year, month)
+summary_cache = LRUCache(maxsize=256, name="ae_summary")
 
-def create_summary(deal_data, ae_data, year, month=None):
+
+def create_summary(deal_data, ae_data, year, month=None, cube=None):
     """
     Generates a global and per-AE summary of compensation metrics for a given year and optional month.
 
@@ -15,44 +21,32 @@ def create_summary(deal_data, ae_data, year, month=None):
     - ae_data: DataFrame containing AE information.
     - year: Year to filter compensation calculations.
     - month: Optional month (1-12) to filter within the specified year.
+    - cube: Optional precomputed CompensationCube of the data; built from
+      deal_data and ae_data when omitted.
 
     Returns:
     - global_summary: Dictionary containing global compensation metrics.
     - summary_by_ae: DataFrame containing compensation metrics for each AE.
     """
+    if cube is None:
+        cube = build_compensation_cube(deal_data, ae_data)
 
-    # Ensure Payment_Date is valid (not NaN)
-    deal_data = deal_data[~deal_data["Payment_Date"].isna()]
-
-    # Add a payment_date_service column for services, retroactive by one month
-    deal_data["Payment_Date_Service"] = deal_data["Close_Date"] + pd.DateOffset(
-        months=1
-    )
-    # print("deal_data columns:", deal_data.columns)
-    # Filter deals and AE info based on year and optional month
-    filtered_deals = deal_data[deal_data["Payment_Date"].dt.year == year]
-    if month:
-        filtered_deals = filtered_deals[
-            filtered_deals["Payment_Date"].dt.month == month
-        ]
-
-    # Filter services compensation using payment_date_service
-    filtered_services = deal_data[
-        (deal_data["Payment_Date_Service"].dt.year == year)
-        & (month is None or deal_data["Payment_Date_Service"].dt.month == month)
-    ]
+    # Slice the AE x year x month cube for the selected period. Services are
+    # paid on their own date, one month after the close date.
+    with stage("filter"):
+        period = cube.slice(year, month)
 
     # Global Summary
     global_summary = {
-        "total_upsell_comp": filtered_deals["Upsell_Comp"].sum(),
-        "total_new_logo_comp": filtered_deals["New_Logo_Comp"].sum(),
-        "total_services_comp": filtered_services["Services_Comp"].sum(),
+        "total_upsell_comp": period["Upsell_Comp"].sum(),
+        "total_new_logo_comp": period["New_Logo_Comp"].sum(),
+        "total_services_comp": period["Services_Comp"].sum(),
         "total_accelerator_bonus_annual": ae_data["Accelerator_Bonus_Annual"].sum(),
-        "total_acv": filtered_deals["ACV"].sum(),
+        "total_acv": period["ACV"].sum(),
         "total_compensation": (
-            filtered_deals["Upsell_Comp"].sum()
-            + filtered_deals["New_Logo_Comp"].sum()
-            + filtered_services["Services_Comp"].sum()
+            period["Upsell_Comp"].sum()
+            + period["New_Logo_Comp"].sum()
+            + period["Services_Comp"].sum()
             + ae_data["Accelerator_Bonus_Annual"].sum()
             + (
                 ae_data["Base_Salary_Annual"].sum() / 12
@@ -70,39 +64,29 @@ def create_summary(deal_data, ae_data, year, month=None):
     # Adjust base salary for monthly view
     if month:
         summary_by_ae["Base_Salary_Annual"] /= 12
-        # Calculate accelerator dynamicallly depending on month selected
-        accelerator_df = calculate_monthly_accelerators(deal_data, ae_data, year, month)
-        print("accelerator_df:", accelerator_df[accelerator_df["AE"] == "APAC-1"])
-        # Merge accelerator bonuses into the AE summary
-        # summary_by_ae = pd.merge(
-        #     summary_by_ae,
-        #     accelerator_df[accelerator_df["Month"] == month][
-        #         ["AE", "Accelerator_Bonus_Monthly"]
-        #     ],
-        #     on="AE",
-        #     how="left",
-        # ).fillna(
-        #     0
-        # )  # Fill missing values with 0 for AEs without bonuses
-
-    # Group filtered_deals by AE for variable compensation components
+
+    # Variable compensation components of each AE in the period
     variable_comp_by_ae = (
-        filtered_deals.groupby("AE")
-        .agg(
-            total_upsell_comp=("Upsell_Comp", "sum"),
-            total_new_logo_comp=("New_Logo_Comp", "sum"),
-            total_services_comp=("Services_Comp", "sum"),
-            total_acv=("ACV", "sum"),
+        period[["Upsell_Comp", "New_Logo_Comp", "Services_Comp", "ACV"]]
+        .rename(
+            columns={
+                "Upsell_Comp": "total_upsell_comp",
+                "New_Logo_Comp": "total_new_logo_comp",
+                "Services_Comp": "total_services_comp",
+                "ACV": "total_acv",
+            }
         )
+        .rename_axis("AE")
         .reset_index()
     )
 
     # Merge variable compensation into summary_by_ae
-    summary_by_ae = pd.merge(
-        summary_by_ae, variable_comp_by_ae, on="AE", how="left"
-    ).fillna(
-        0
-    )  # Fill missing values with 0 for AEs without deals
+    with stage("merge"):
+        summary_by_ae = pd.merge(
+            summary_by_ae, variable_comp_by_ae, on="AE", how="left"
+        ).fillna(
+            0
+        )  # Fill missing values with 0 for AEs without deals
 
     # Calculate total compensation
     summary_by_ae["total_compensation"] = (
@@ -116,6 +100,30 @@ def create_summary(deal_data, ae_data, year, month=None):
     return global_summary, summary_by_ae
 
 
+def create_summary_cached(
+    deal_data, ae_data, dataset_version, year, month=None, cube=None
+):
+    """
+    Memoized create_summary for a given dataset version.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information.
+    - ae_data: DataFrame containing AE information.
+    - dataset_version: Identifier of the data, changing whenever it is reloaded.
+    - year: Year to filter compensation calculations.
+    - month: Optional month (1-12) to filter within the specified year.
+    - cube: Optional precomputed CompensationCube of the data.
+
+    Returns:
+    - global_summary, summary_by_ae: As returned by create_summary, shared
+      between callers and therefore read-only.
+    """
+    return summary_cache.get_or_compute(
+        (dataset_version, year, month or None),
+        lambda: create_summary(deal_data, ae_data, year, month, cube=cube),
+    )
+
+
 def create_layout(app):
 
     return html.Div(
@@ -185,6 +193,14 @@ def create_layout(app):
                 ],
                 className="filters-container",
             ),
+            html.Div(
+                [
+                    html.Progress(id="ae-progress", value="0", max="3"),
+                ],
+                id="ae-progress-container",
+                className="progress-container",
+                style={"display": "none"},
+            ),
             html.Div(
                 [
                     html.Div(id="summary-container"),
@@ -204,36 +220,40 @@ def create_layout(app):
 
 
 def register_callbacks(app):
-    @app.callback(
-        [
-            Output("summary-container", "children"),  # Update the summary
-            # Output("total-compensation-bar-chart", "figure"),  # Bar chart
-            Output("stacked-compensation-bar-chart", "figure"),  # Stacked bar chart
-            # Output("download-ae-Data", "value"),  # Data for downloading
-        ],
-        [
-            Input("year-input", "value"),
-            Input("month-input", "value"),
-            # Input("download-ae-data-btn", "n_clicks"),
-        ],
-        prevent_initial_call=True,
-    )
-    def update_content(selected_year, selected_month):  # , n_clicks):
+    outputs = [
+        Output("summary-container", "children"),  # Update the summary
+        # Output("total-compensation-bar-chart", "figure"),  # Bar chart
+        Output("stacked-compensation-bar-chart", "figure"),  # Stacked bar chart
+        # Output("download-ae-Data", "value"),  # Data for downloading
+    ]
+    inputs = [
+        Input("year-input", "value"),
+        Input("month-input", "value"),
+        # Input("download-ae-data-btn", "n_clicks"),
+    ]
+
+    def update_content(set_progress, selected_year, selected_month):  # , n_clicks):
         # print(f"Selected Year: {selected_year}, Selected Month: {selected_month}")
         if not selected_year:
-            return "Please select a year.", {
-                "please select year"
-            }  # Default response if no year is selected
+            # Default response if no year is selected
+            return "Please select a year.", {}
 
-        # Access deal_data and ae_data from app.server
-        deal_data = app.server.deal_data
-        ae_data = app.server.ae_data
+        # Access the current data snapshot from app.server
+        snapshot = app.server.dataset.snapshot
+        set_progress(("1", "3"))
 
         # Generate the summary and grouped data
-        global_summary, summary_by_ae = create_summary(
-            deal_data, ae_data, year=selected_year, month=selected_month
+        global_summary, summary_by_ae = create_summary_cached(
+            snapshot.deal_data,
+            snapshot.ae_data,
+            snapshot.version,
+            year=selected_year,
+            month=selected_month,
+            cube=snapshot.cube,
         )
 
+        set_progress(("2", "3"))
+
         # print("summary by AE:", summary_by_ae)
         # print(global_summary)
 
@@ -272,50 +292,53 @@ def register_callbacks(app):
             "Base_Salary_Annual": "rgba(160, 192, 250, 1)",  # light blue
         }
         # Stacked Bar Chart: Breakdown of Total Compensation by Component if year selected use global summary, if month selected use summary by AE
-        stacked_bar_chart = px.bar(
-            summary_by_ae.melt(
-                id_vars="AE",
-                value_vars=[
-                    "total_upsell_comp",
-                    "total_new_logo_comp",
-                    "total_services_comp",
-                    # "Accelerator_Bonus",
-                    "Base_Salary_Annual",
-                ],
-                var_name="Compensation Component",
-                value_name="Amount",
-            ),
-            x="AE",
-            y="Amount",
-            color="Compensation Component",
-            color_discrete_map=color_mapping,
-            title=f"Compensation Breakdown by Component ({selected_year}, {selected_month or 'All Months'})",
-            labels={"Amount": "Compensation ($)", "AE": "Account Executive"},
-            barmode="stack",
-        )
+        with stage("figure"):
+            stacked_bar_chart = px.bar(
+                summary_by_ae.melt(
+                    id_vars="AE",
+                    value_vars=[
+                        "total_upsell_comp",
+                        "total_new_logo_comp",
+                        "total_services_comp",
+                        # "Accelerator_Bonus",
+                        "Base_Salary_Annual",
+                    ],
+                    var_name="Compensation Component",
+                    value_name="Amount",
+                ),
+                x="AE",
+                y="Amount",
+                color="Compensation Component",
+                color_discrete_map=color_mapping,
+                title=f"Compensation Breakdown by Component ({selected_year}, {selected_month or 'All Months'})",
+                labels={"Amount": "Compensation ($)", "AE": "Account Executive"},
+                barmode="stack",
+            )
 
-        stacked_bar_chart.update_layout(
-            title=dict(
-                text=f"Compensation Breakdown by Component ({selected_year}, {selected_month or 'All Months'})",
-                x=0.5,  # Center the title
-                font=dict(size=19),
-            ),
-            legend=dict(
-                orientation="h",  # Horizontal legend
-                yanchor="bottom",
-                y=-0.3,  # Position below the chart
-                xanchor="center",
-                x=0.5,
-                title=None,  # Remove the legend title
-            ),
-            xaxis=dict(
-                title="", tickangle=45  # Tilt x-axis labels for better readability
-            ),
-            yaxis=dict(title="Compensation ($)"),
-            margin=dict(l=10, r=10, t=40, b=80),  # Adjust margins for better spacing
-            height=500,  # Set the height of the chart
-            autosize=True,  # Allow resizing
-        )
+            stacked_bar_chart.update_layout(
+                title=dict(
+                    text=f"Compensation Breakdown by Component ({selected_year}, {selected_month or 'All Months'})",
+                    x=0.5,  # Center the title
+                    font=dict(size=19),
+                ),
+                legend=dict(
+                    orientation="h",  # Horizontal legend
+                    yanchor="bottom",
+                    y=-0.3,  # Position below the chart
+                    xanchor="center",
+                    x=0.5,
+                    title=None,  # Remove the legend title
+                ),
+                xaxis=dict(
+                    title="", tickangle=45  # Tilt x-axis labels for better readability
+                ),
+                yaxis=dict(title="Compensation ($)"),
+                margin=dict(
+                    l=10, r=10, t=40, b=80
+                ),  # Adjust margins for better spacing
+                height=500,  # Set the height of the chart
+                autosize=True,  # Allow resizing
+            )
 
         # Prepare data for download
 
@@ -333,4 +356,42 @@ def register_callbacks(app):
             # Return downloadable data
             return summary_content, stacked_bar_chart, dcc.send_data_frame(summary_by_ae_csv.to_csv, "ae_compensation_summary.csv" """
 
+        set_progress(("3", "3"))
         return summary_content, stacked_bar_chart  # , downloadable_data
+
+    # Run the query in a worker process when background callbacks are enabled.
+    # Its results are cached per dataset version and served without a new
+    # process, and a running query is cancelled when the dropdowns change
+    # again or the user leaves the page.
+    manager = create_background_manager(
+        cache_by=[lambda: app.server.dataset.snapshot.version],
+        name="update_content",
+    )
+    if manager is not None:
+        app.callback(
+            outputs,
+            inputs,
+            prevent_initial_call=True,
+            background=True,
+            manager=manager,
+            interval=BACKGROUND_POLL_INTERVAL,
+            progress=[
+                Output("ae-progress", "value"),
+                Output("ae-progress", "max"),
+            ],
+            running=[
+                (
+                    Output("ae-progress-container", "style"),
+                    {"display": "block"},
+                    {"display": "none"},
+                ),
+            ],
+            cancel=[Input("url", "pathname")],
+        )(update_content)
+        return
+
+    # Otherwise compute the query in the request thread
+    @app.callback(outputs, inputs, prevent_initial_call=True)
+    @instrument("update_content")
+    def update_content_sync(selected_year, selected_month):
+        return update_content(lambda progress: None, selected_year, selected_month)
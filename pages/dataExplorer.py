@@ -1,9 +1,267 @@
+import io
+import math
+import re
+import zlib
+
 from dash import html, dash_table, dcc, Input, Output, callback, State
+from flask import Response, abort, stream_with_context
 import plotly.express as px
+import numpy as np
 import pandas as pd
+from utils.metrics import instrument, stage, stream_stage
+from utils.singleflight import single_flight
+
+# Tables of the page and the snapshot frame each one pages through
+TABLE_FRAMES = {"deal-data-table": "deal_data", "ae-data-table": "ae_data"}
+
+# Frames that can be downloaded through the streaming route
+DOWNLOAD_FRAMES = ["deal_data", "ae_data"]
+
+# Rows serialized per chunk of a streamed download
+DOWNLOAD_CHUNK_ROWS = 50_000
+
+# Filter operators understood by the DataTable, with their aliases
+FILTER_OPERATORS = [
+    ["ge ", ">="],
+    ["le ", "<="],
+    ["lt ", "<"],
+    ["gt ", ">"],
+    ["ne ", "!="],
+    ["eq ", "="],
+    ["contains "],
+    ["datestartswith "],
+]
+
+# Date prefixes of a year, a month or a day, as typed in a date filter
+DATE_PREFIX = re.compile(r"\d{4}(-\d{2}(-\d{2})?)?")
+
+# Lower (True) or upper bound set by each comparison of a date clause, and
+# whether the compared date itself is excluded from the window
+DATE_BOUNDS = {
+    "ge": [(True, False)],
+    "gt": [(True, True)],
+    "le": [(False, False)],
+    "lt": [(False, True)],
+    "eq": [(True, False), (False, False)],
+}
+
+
+def split_filter_part(filter_part):
+    """
+    Parse one clause of a DataTable filter query.
+
+    Parameters:
+    - filter_part: Clause such as "{ACV} >= 1000" or "{AE} contains NOLA".
+
+    Returns:
+    - name, operator, value: Column name, canonical operator and value, or
+      Nones if the clause cannot be parsed.
+    """
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find("{") + 1 : name_part.rfind("}")]
+
+                value_part = value_part.strip()
+                quote = value_part[:1]
+                if quote and quote == value_part[-1] and quote in ("'", '"', "`"):
+                    value = value_part[1:-1].replace("\\" + quote, quote)
+                elif operator_type[0] in ("contains ", "datestartswith "):
+                    # Text matches search the operand as typed
+                    value = value_part
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                return name, operator_type[0].strip(), value
+
+    return None, None, None
+
+
+def filter_frame(frame, filter_query):
+    """
+    Apply a DataTable filter query to a DataFrame.
+
+    Parameters:
+    - frame: DataFrame to filter.
+    - filter_query: Filter query sent by the DataTable (clauses joined by " && ").
+
+    Returns:
+    - frame: The rows matching every clause.
+    """
+    if not filter_query:
+        return frame
+
+    mask = pd.Series(True, index=frame.index)
+    for filter_part in filter_query.split(" && "):
+        name, operator, value = split_filter_part(filter_part)
+        if name not in frame.columns:
+            continue
+        column = frame[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Evaluate the clause once per category and expand it to the rows
+            category_matches = np.append(
+                match_values(pd.Series(column.cat.categories), operator, value),
+                False,
+            )
+            mask &= category_matches[column.cat.codes.to_numpy()]
+        else:
+            mask &= match_values(column, operator, value).to_numpy()
+
+    return frame[mask]
+
+
+def filter_window(filter_query, column="Payment_Date"):
+    """
+    Find the date window a DataTable filter query restricts a column to.
+
+    datestartswith clauses with a year, month or day prefix (e.g. "2024",
+    "2024-03") and the comparisons with a date set the window; other clauses
+    leave it unbounded.
+
+    Parameters:
+    - filter_query: Filter query sent by the DataTable (clauses joined by " && ").
+    - column: Name of the date column.
+
+    Returns:
+    - start: First date of the window (inclusive), or None when unbounded.
+    - end: End of the window (exclusive), or None when unbounded.
+    """
+    start, end = None, None
+    for filter_part in (filter_query or "").split(" && "):
+        name, operator, value = split_filter_part(filter_part)
+        # Numeric operands are never dates (see split_filter_part)
+        if name != column or not isinstance(value, str):
+            continue
+        try:
+            if operator == "datestartswith" and DATE_PREFIX.fullmatch(value):
+                period = pd.Period(value)
+                bounds = [(period.start_time, True), ((period + 1).start_time, False)]
+            elif operator in DATE_BOUNDS:
+                date = pd.Timestamp(value)
+                bounds = [
+                    (
+                        date + pd.Timedelta(1, "ns") if excluded == lower else date,
+                        lower,
+                    )
+                    for lower, excluded in DATE_BOUNDS[operator]
+                ]
+            else:
+                continue
+        except ValueError:
+            # Dates that cannot be parsed leave the window to the clause itself
+            continue
+        for bound, lower in bounds:
+            if lower:
+                start = bound if start is None else max(start, bound)
+            else:
+                end = bound if end is None else min(end, bound)
+    return start, end
+
+
+def match_values(values, operator, value):
+    """
+    Evaluate one filter clause against a Series.
+
+    Parameters:
+    - values: Series to compare.
+    - operator: Canonical operator returned by split_filter_part.
+    - value: Value to compare with.
+
+    Returns:
+    - matches: Boolean Series, False where the values cannot be compared.
+    """
+    try:
+        if operator == "contains":
+            matches = values.astype(str).str.contains(str(value), regex=False)
+        elif operator == "datestartswith":
+            matches = values.astype(str).str.startswith(str(value))
+        else:
+            matches = {
+                "eq": values.__eq__,
+                "ne": values.__ne__,
+                "lt": values.__lt__,
+                "le": values.__le__,
+                "gt": values.__gt__,
+                "ge": values.__ge__,
+            }[operator](value)
+    except TypeError:
+        # Values that cannot be compared with the column match nothing
+        matches = pd.Series(False, index=values.index)
+    return matches.fillna(False).astype(bool)
+
+
+def query_page(frame, page_current, page_size, sort_by, filter_query, index=None):
+    """
+    Filter, sort and slice a DataFrame for a backend-paged DataTable.
+
+    Parameters:
+    - frame: DataFrame held by the server.
+    - page_current: Zero-based index of the requested page.
+    - page_size: Number of rows per page.
+    - sort_by: List of {"column_id", "direction"} sort specifications.
+    - filter_query: Filter query sent by the DataTable.
+    - index: Optional PaymentIndex of the frame; the Payment_Date window of
+      the filter query is then looked up by binary search, and the other
+      clauses only evaluated over the deals paid in it.
+
+    Returns:
+    - records: Rows of the requested page as a list of dicts.
+    - page_count: Number of pages of the filtered data.
+    """
+    with stage("filter"):
+        if index is not None:
+            start, end = filter_window(filter_query)
+            if start is not None or end is not None:
+                # Keep the rows in the frame's order
+                frame = frame.iloc[np.sort(index.positions(start, end))]
+        frame = filter_frame(frame, filter_query)
+
+    sort_by = [column for column in sort_by or [] if column["column_id"] in frame]
+    if sort_by:
+        with stage("sort"):
+            frame = frame.sort_values(
+                [column["column_id"] for column in sort_by],
+                ascending=[column["direction"] == "asc" for column in sort_by],
+                kind="stable",
+            )
+
+    page_current = page_current or 0
+    start = page_current * page_size
+    with stage("serialize"):
+        records = frame.iloc[start : start + page_size].to_dict("records")
+    return records, max(1, math.ceil(len(frame) / page_size))
+
+
+def table_columns(frame):
+    """
+    Describe a DataFrame's columns for a DataTable, typed for filtering.
+
+    Parameters:
+    - frame: DataFrame displayed by the table.
+
+    Returns:
+    - columns: List of DataTable column definitions.
+    """
+    columns = []
+    for name, dtype in frame.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            column_type = "datetime"
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(
+            dtype
+        ):
+            column_type = "numeric"
+        else:
+            column_type = "text"
+        columns.append({"name": name, "id": name, "type": column_type})
+    return columns
 
 
 def create_layout(app):
+    snapshot = app.server.dataset.snapshot
     return html.Div(
         [
             html.Div(
@@ -17,20 +275,31 @@ def create_layout(app):
             ),
             html.Div(
                 [
-                    html.Button(
-                        id="submit-button-state", n_clicks=0, children="Download Data"
+                    # Streamed by the /download route instead of a callback
+                    html.A(
+                        html.Button(
+                            id="submit-button-state",
+                            n_clicks=0,
+                            children="Download Data",
+                        ),
+                        href="/download/deal_data.csv",
                     ),
-                    dcc.Download(id="download-dataframe"),
                 ],
                 className="download-container-de",
             ),
-            # Table for Deal Data
+            # Table for Deal Data (rows are paged, sorted and filtered server-side)
             html.H2("Deal Data"),
             dash_table.DataTable(
                 id="deal-data-table",
-                columns=[{"name": i, "id": i} for i in app.server.deal_data.columns],
-                data=app.server.deal_data.to_dict("records"),
+                columns=table_columns(snapshot.deal_data),
+                page_current=0,
                 page_size=10,
+                page_action="custom",
+                sort_action="custom",
+                sort_mode="multi",
+                sort_by=[],
+                filter_action="custom",
+                filter_query="",
                 style_table={
                     "width": "90%",  # Ensures table stretches to full width
                     "overflowX": "auto",  # Enables horizontal scrolling if needed
@@ -50,9 +319,15 @@ def create_layout(app):
             html.H2("AE Data"),
             dash_table.DataTable(
                 id="ae-data-table",
-                columns=[{"name": i, "id": i} for i in app.server.ae_data.columns],
-                data=app.server.ae_data.to_dict("records"),
+                columns=table_columns(snapshot.ae_data),
+                page_current=0,
                 page_size=10,
+                page_action="custom",
+                sort_action="custom",
+                sort_mode="multi",
+                sort_by=[],
+                filter_action="custom",
+                filter_query="",
                 style_table={"overflowX": "auto"},
             ),
         ]
@@ -60,16 +335,140 @@ def create_layout(app):
 
 
 def register_callbacks_data_explorer(app):
+    # Compute identical concurrent queries of the same data once
+    query = single_flight(
+        name="table_query", version=lambda: app.server.dataset.snapshot.version
+    )(query_page)
 
-    @app.callback(
-        Output("download-dataframe", "data"),
-        Input("submit-button-state", "n_clicks"),
-        prevent_initial_call=True,
-    )
-    def update_output_button(n_clicks):
+    # Serve one page at a time from the frames held by the server
+    for table_id, frame_name in TABLE_FRAMES.items():
+
+        @app.callback(
+            Output(table_id, "data"),
+            Output(table_id, "page_count"),
+            Input(table_id, "page_current"),
+            Input(table_id, "page_size"),
+            Input(table_id, "sort_by"),
+            Input(table_id, "filter_query"),
+        )
+        @instrument(f"update_table:{table_id}")
+        def update_table(
+            page_current, page_size, sort_by, filter_query, frame_name=frame_name
+        ):
+            snapshot = app.server.dataset.snapshot
+            return query(
+                getattr(snapshot, frame_name),
+                page_current,
+                page_size,
+                sort_by,
+                filter_query,
+                index=snapshot.payment_index if frame_name == "deal_data" else None,
+            )
+
+
+def stream_csv(frame, chunk_rows=DOWNLOAD_CHUNK_ROWS, compress=False):
+    """
+    Serialize a DataFrame as CSV, one chunk of rows at a time.
+
+    Parameters:
+    - frame: DataFrame to serialize.
+    - chunk_rows: Number of rows per chunk.
+    - compress: Whether to gzip the output.
+
+    Yields:
+    - chunk: Bytes of the next part of the file.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        chunk = frame.iloc[start : start + chunk_rows].to_csv(header=start == 0)
+        chunk = chunk.encode()
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Writable file object collecting bytes until they are drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(frame, chunk_rows=DOWNLOAD_CHUNK_ROWS):
+    """
+    Serialize a DataFrame as Parquet, one row group per chunk of rows.
+
+    Parameters:
+    - frame: DataFrame to serialize.
+    - chunk_rows: Number of rows per row group.
+
+    Yields:
+    - chunk: Bytes of the next part of the file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for start in range(0, len(frame), chunk_rows):
+            chunk = frame.iloc[start : start + chunk_rows]
+            writer.write_table(
+                pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            )
+            yield sink.drain()
+    yield sink.drain()
+
+
+# Download formats: file extension -> (serializer, mimetype)
+DOWNLOAD_FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "csv.gz": (lambda frame: stream_csv(frame, compress=True), "application/gzip"),
+    "parquet": (stream_parquet, "application/vnd.apache.parquet"),
+}
+
+
+def register_download_routes(app):
+    """
+    Serve the server-side frames as streamed files.
+
+    Files are available at /download/<frame>.<format>, where frame is one of
+    DOWNLOAD_FRAMES and format one of "csv", "csv.gz" or "parquet".
+
+    Parameters:
+    - app: Dash app whose server holds the dataset.
+    """
+
+    @app.server.route("/download/<filename>")
+    def download_frame(filename):
+        frame_name, _, extension = filename.partition(".")
+        if frame_name not in DOWNLOAD_FRAMES or extension not in DOWNLOAD_FORMATS:
+            abort(404)
 
-        # Access deal_data and ae_data from app.server
-        deal_data = app.server.deal_data
-        ae_data = app.server.ae_data
+        name = f"download:{frame_name}"
+        return instrument(name)(stream_frame)(name, frame_name, extension, filename)
 
-        return dcc.send_data_frame(deal_data.to_csv, "deal_data.csv")
+    def stream_frame(name, frame_name, extension, filename):
+        serialize, mimetype = DOWNLOAD_FORMATS[extension]
+        # The stream keeps reading the snapshot it started with
+        frame = getattr(app.server.dataset.snapshot, frame_name)
+        return Response(
+            stream_with_context(stream_stage(serialize(frame), name, "serialize")),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
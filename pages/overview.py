@@ -1,6 +1,13 @@
+import json
+
 from dash import html, dcc
 import plotly.express as px
 from components.card import Card
+from utils.memo import LRUCache
+from utils.metrics import stage
+
+# Summary and serialized figures of the page, keyed by dataset version
+overview_cache = LRUCache(maxsize=2, name="overview")
 
 def create_summary(deal_data):
     """
@@ -15,12 +22,12 @@ def create_summary(deal_data):
     upsells_count = len(deal_data[deal_data['Type'] == 'Upsell'])
 
     # Group data by AE to find the top AE
-    ae_grouped = deal_data.groupby('AE')['Total_Comp'].sum().reset_index()
+    ae_grouped = deal_data.groupby('AE', observed=True)['Total_Comp'].sum().reset_index()
     top_ae_row = ae_grouped.loc[ae_grouped['Total_Comp'].idxmax()]
     top_ae = top_ae_row['AE']
 
     # Group data by Market to find the top performing market
-    market_grouped = deal_data.groupby('Market')['ACV'].sum()
+    market_grouped = deal_data.groupby('Market', observed=True)['ACV'].sum()
     top_market = market_grouped.idxmax()
 
     # Find the most successful lead source
@@ -39,18 +46,42 @@ def create_summary(deal_data):
 
     return summary
 
-def create_layout(app):
-    # Access deal_data from app.server
-    deal_data = app.server.deal_data
+def build_overview(deal_data):
+    """
+    Compute the page summary and build its figures, serialized as JSON.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information (left unmodified).
 
+    Returns:
+    - summary: Dictionary of summary metrics (see create_summary).
+    - figures: Dictionary of figure name -> Plotly figure JSON.
+    """
     # Generate the summary
-    summary = create_summary(deal_data)
+    with stage('groupby'):
+        summary = create_summary(deal_data)
+
+    with stage('figure'):
+        figures = build_figures(deal_data)
 
-    # Add a 'Month' column for time-based aggregation
-    deal_data['Month'] = deal_data['Close_Date'].dt.to_period('M').astype(str)
+    with stage('serialize'):
+        return summary, {name: figure.to_json() for name, figure in figures.items()}
+
+def build_figures(deal_data):
+    """
+    Build the Plotly figures of the page.
+
+    Parameters:
+    - deal_data: DataFrame containing deal information (left unmodified).
+
+    Returns:
+    - figures: Dictionary of figure name -> Plotly figure.
+    """
+    # Month of each deal for time-based aggregation
+    month = deal_data['Close_Date'].dt.to_period('M').astype(str).rename('Month')
 
     # Line Chart: Monthly Trends
-    monthly_trends = deal_data.groupby('Month')[['ACV', 'Services']].sum().reset_index()
+    monthly_trends = deal_data.groupby(month, observed=True)[['ACV', 'Services']].sum().reset_index()
     line_chart = px.line(
         monthly_trends,
         x='Month',
@@ -82,7 +113,7 @@ def create_layout(app):
   
 
     # Bar Chart: Revenue by Type
-    revenue_by_type = deal_data.groupby('Type')[['ACV', 'Services']].sum().reset_index()
+    revenue_by_type = deal_data.groupby('Type', observed=True)[['ACV', 'Services']].sum().reset_index()
     revenue_by_type['Total_Revenue'] = revenue_by_type['ACV'] + revenue_by_type['Services']
     bar_chart = px.bar(
         revenue_by_type,
@@ -110,7 +141,7 @@ def create_layout(app):
         width=350,  # Set the width of the chart
     )
     # Heatmap: Market Performance
-    market_performance = deal_data.groupby(['Market', 'Type'])['ACV'].sum().reset_index()
+    market_performance = deal_data.groupby(['Market', 'Type'], observed=True)['ACV'].sum().reset_index()
     heatmap = px.density_heatmap(
         market_performance,
         x='Market',
@@ -185,6 +216,25 @@ def create_layout(app):
         showlegend=False,  # Hide the legend for a cleaner look
     )
 
+    figures = {
+        'line_chart': line_chart,
+        'bar_chart': bar_chart,
+        'heatmap': heatmap,
+        'funnel_chart': funnel_chart,
+    }
+    return figures
+
+def create_layout(app):
+    # Build the summary and figures once per dataset version
+    snapshot = app.server.dataset.snapshot
+    summary, figures = overview_cache.get_or_compute(
+        snapshot.version, lambda: build_overview(snapshot.deal_data)
+    )
+    line_chart = json.loads(figures['line_chart'])
+    bar_chart = json.loads(figures['bar_chart'])
+    heatmap = json.loads(figures['heatmap'])
+    funnel_chart = json.loads(figures['funnel_chart'])
+
     return html.Div(
         [
             html.Div(
@@ -1,11 +1,182 @@
-from dash import html
+from dash import html, dcc
+from dash.dependencies import Input, Output
+import numpy as np
+import plotly.express as px
+from components.card import Card
+from compensation_model.scenarioEngine import (
+    evaluate_scenarios,
+    scenario_grid,
+    scenario_inputs,
+)
+from utils.memo import LRUCache
+from utils.metrics import instrument, stage
+
+# Per-AE scenario inputs, keyed by dataset version
+inputs_cache = LRUCache(maxsize=2, name="scenario_inputs")
+
+
+def scale_slider(slider_id, label):
+    """
+    Create a labelled range slider selecting the span of a scale factor.
+
+    Parameters:
+    - slider_id: Id of the RangeSlider.
+    - label: Text displayed above the slider.
+
+    Returns:
+    - Dash HTML Div: The label and the slider.
+    """
+    return html.Div(
+        [
+            html.Label(label),
+            dcc.RangeSlider(
+                id=slider_id,
+                min=0.5,
+                max=1.5,
+                step=0.05,
+                value=[0.8, 1.2],
+                marks={value: f"{value:.0%}" for value in [0.5, 0.75, 1.0, 1.25, 1.5]},
+            ),
+        ],
+        className="scenario-slider",
+    )
 
 
 def create_layout(app):
     return html.Div(
         [
-            html.H1("Quota Strategy"),
-            html.P("This page presents quota distribution and recommendations."),
+            html.Div(
+                [
+                    html.H1("Quota Strategy"),
+                    html.P(
+                        "This page sweeps variants of the quotas, ACV rates and accelerator thresholds and shows the distribution of the resulting payouts.",
+                        className="page-description",
+                    ),
+                ],
+                className="header-container",
+            ),
+            html.Div(
+                [
+                    scale_slider("quota-scale-range", "Quota (% of current):"),
+                    scale_slider("rate-scale-range", "ACV Rate (% of current):"),
+                    scale_slider(
+                        "threshold-scale-range",
+                        "Accelerator Thresholds (% of current):",
+                    ),
+                    html.Div(
+                        [
+                            html.Label("Steps per Variable:"),
+                            dcc.Slider(
+                                id="scenario-steps",
+                                min=2,
+                                max=20,
+                                step=1,
+                                value=10,
+                                marks={
+                                    steps: str(steps) for steps in [2, 5, 10, 15, 20]
+                                },
+                            ),
+                        ],
+                        className="scenario-slider",
+                    ),
+                ],
+                className="filters-container",
+            ),
+            html.Div(
+                [
+                    html.Div(id="scenario-summary-container"),
+                ],
+                className="summary-container",
+            ),
+            html.Div(
+                [
+                    dcc.Graph(id="scenario-payout-histogram"),
+                ],
+                className="graphs-container",
+            ),
+        ],
+        className="size-page-container",
+    )
+
+
+def register_callbacks_quota_strategy(app):
+    @app.callback(
+        [
+            Output("scenario-summary-container", "children"),
+            Output("scenario-payout-histogram", "figure"),
+        ],
+        [
+            Input("quota-scale-range", "value"),
+            Input("rate-scale-range", "value"),
+            Input("threshold-scale-range", "value"),
+            Input("scenario-steps", "value"),
         ],
-        className="header-container",
     )
+    @instrument("update_scenarios")
+    def update_scenarios(quota_range, rate_range, threshold_range, steps):
+        snapshot = app.server.dataset.snapshot
+        inputs = inputs_cache.get_or_compute(
+            snapshot.version, lambda: scenario_inputs(snapshot.ae_data)
+        )
+
+        # Evaluate every combination of the three scales in one batch
+        with stage("scenarios"):
+            scenarios = scenario_grid(
+                np.linspace(*quota_range, steps),
+                np.linspace(*rate_range, steps),
+                np.linspace(*threshold_range, steps),
+                tiers=snapshot.tiers,
+            )
+            results = evaluate_scenarios(inputs, scenarios, tiers=snapshot.tiers)
+            baseline = evaluate_scenarios(
+                inputs,
+                {"quota_scale": np.ones(1), "rate_scale": np.ones(1)},
+                tiers=snapshot.tiers,
+            )
+
+        total_payout = results["total_payout"]
+        summary_content = html.Div(
+            [
+                Card("Scenarios Evaluated", f"{total_payout.size:,}"),
+                Card("Current Plan Payout", f"${baseline['total_payout'][0]:,.2f}"),
+                Card("Median Payout", f"${np.median(total_payout):,.2f}"),
+                Card(
+                    "Payout Range (5th-95th Percentile)",
+                    f"${np.percentile(total_payout, 5):,.0f} - "
+                    f"${np.percentile(total_payout, 95):,.0f}",
+                ),
+                Card(
+                    "Median Accelerator Bonus",
+                    f"${np.median(results['accelerator_bonus']):,.2f}",
+                ),
+            ],
+            className="summary-metrics",
+        )
+
+        # Histogram: Distribution of the total payout over the scenarios
+        with stage("figure"):
+            histogram = px.histogram(
+                x=total_payout,
+                color=np.round(scenarios["quota_scale"], 2).astype(str),
+                nbins=50,
+                labels={"x": "Total Payout ($)", "color": "Quota Scale"},
+            )
+            histogram.add_vline(
+                x=baseline["total_payout"][0],
+                line_dash="dash",
+                annotation_text="Current Plan",
+            )
+            histogram.update_layout(
+                title=dict(
+                    text="Distribution of Total Payout across Scenarios",
+                    x=0.5,  # Center the title
+                    font=dict(size=19),
+                ),
+                barmode="stack",
+                yaxis=dict(title="Scenarios"),
+                margin=dict(l=10, r=10, t=40, b=80),
+                height=500,
+                autosize=True,
+            )
+
+        return summary_content, histogram
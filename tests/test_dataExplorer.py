@@ -0,0 +1,95 @@
+import unittest
+
+import pandas as pd
+from benchmarks.synthetic import generate_dataset
+from compensation_model.calculations import calculate_compensation
+from compensation_model.paymentIndex import PaymentIndex, period_bounds
+from compensation_model.schema import compact_frames
+from pages.dataExplorer import filter_window, query_page
+
+
+class PaymentDateFilterTest(unittest.TestCase):
+    """The deal table serves Payment_Date filters from the PaymentIndex."""
+
+    @classmethod
+    def setUpClass(cls):
+        raw_deals, raw_aes = generate_dataset(3000, 12)
+        cls.deal_data, _ = compact_frames(
+            *calculate_compensation(raw_deals, raw_aes, [])
+        )
+        cls.index = PaymentIndex(cls.deal_data)
+
+    def assert_same_pages(self, filter_query):
+        # The indexed path returns the rows of a full scan, in the same order
+        for page_current in (0, 2):
+            for sort_by in ([], [{"column_id": "ACV", "direction": "desc"}]):
+                scanned = query_page(
+                    self.deal_data, page_current, 25, sort_by, filter_query
+                )
+                indexed = query_page(
+                    self.deal_data,
+                    page_current,
+                    25,
+                    sort_by,
+                    filter_query,
+                    index=self.index,
+                )
+                self.assertEqual(scanned[1], indexed[1])
+                pd.testing.assert_frame_equal(
+                    pd.DataFrame(scanned[0]), pd.DataFrame(indexed[0])
+                )
+
+    def test_year_prefix(self):
+        query = "{Payment_Date} datestartswith 2024"
+        self.assertEqual(filter_window(query), period_bounds(2024))
+        self.assertGreater(query_page(self.deal_data, 0, 25, [], query)[1], 1)
+        self.assert_same_pages(query)
+
+    def test_month_prefix(self):
+        query = "{Payment_Date} datestartswith 2024-03"
+        self.assertEqual(filter_window(query), period_bounds(2024, 3))
+        self.assert_same_pages(query)
+
+    def test_day_prefix_within_year(self):
+        query = (
+            "{Payment_Date} datestartswith 2024 && "
+            "{Payment_Date} datestartswith 2024-03-15"
+        )
+        self.assertEqual(
+            filter_window(query),
+            (pd.Timestamp("2024-03-15"), pd.Timestamp("2024-03-16")),
+        )
+        self.assert_same_pages(query)
+
+    def test_comparisons(self):
+        for query in [
+            "{Payment_Date} >= 2024-02-01 && {Payment_Date} < 2024-05-01",
+            "{Payment_Date} > 2024-03-28 && {Payment_Date} <= 2024-05-01",
+            "{Payment_Date} = 2024-03-28",
+            "{Payment_Date} > 2024-08-01 && {Payment_Date} < 2024-02-01",
+            "{Payment_Date} ge 2024-06-15 && {ACV} > 50000",
+        ]:
+            with self.subTest(query=query):
+                self.assert_same_pages(query)
+
+    def test_unparsed_dates_leave_the_window_open(self):
+        for query in [
+            "{Payment_Date} datestartswith 2024-1",
+            "{Payment_Date} datestartswith 2024-13",
+            "{Payment_Date} < 2024-13-01",
+            "{Payment_Date} >= 2024",
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(filter_window(query), (None, None))
+                self.assert_same_pages(query)
+
+    def test_text_operands_are_kept_as_typed(self):
+        rows = query_page(
+            self.deal_data, 0, 10, [], "{Opportunity_ID} contains 0000001"
+        )[0]
+        self.assertTrue(rows)
+        self.assertTrue(all("0000001" in row["Opportunity_ID"] for row in rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
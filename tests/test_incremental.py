@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import generate_dataset
+from compensation_model.calculations import calculate_compensation
+from compensation_model.compensationCube import build_compensation_cube
+from compensation_model.dataset import DatasetSnapshot, replay_deltas
+from compensation_model.dealDeltas import append_delta, locked_delta_log
+from compensation_model.incremental import apply_deal_delta
+from compensation_model.schema import compact_frames
+
+EXCEPTIONS = [{"type": "close_date_payment"}]
+
+
+def accelerator_multiplier(ae_data, ae):
+    # Multiplier of the annual accelerator of one AE
+    row = ae_data.set_index("AE").loc[ae]
+    return row["Accelerator_Bonus_Annual"] / row["New_Logo_Comp"]
+
+
+def to_records(frame):
+    # Deal rows as the JSON body of POST /admin/deals carries them
+    return json.loads(frame.to_json(orient="records", date_format="iso"))
+
+
+class DealDeltaTest(unittest.TestCase):
+    """Incremental deltas match a full recompute of the updated deals."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.raw_deals, cls.raw_aes = generate_dataset(400, 8)
+        cls.deal_data, cls.ae_data = calculate_compensation(
+            cls.raw_deals.copy(), cls.raw_aes.copy(), EXCEPTIONS
+        )
+
+        # Push the AE with the lowest attainment past the accelerator tiers
+        ae = cls.ae_data.sort_values("Attainment")["AE"].iloc[0]
+        owned = cls.raw_deals[cls.raw_deals["Opportunity Owner"] == ae]
+        updated = owned.iloc[:2].copy()
+        updated["Type"] = "New"
+        updated["ACV"] += cls.ae_data.set_index("AE").loc[ae, "Quota"]
+
+        # A deal in a month where its AE has no deals yet
+        added = owned.iloc[[2]].copy()
+        added["Opportunity ID"] = "NEW-0000001"
+        added["Close Date"] = pd.Timestamp("2026-03-10")
+        added["Invoice Date"] = pd.Timestamp("2026-03-20")
+
+        cls.accelerated_ae = ae
+        cls.upserted = pd.concat([updated, added], ignore_index=True)
+        cls.deleted = list(
+            cls.raw_deals["Opportunity ID"].drop(owned.index[:3]).iloc[::40]
+        )
+
+    def recompute(self, upserted, deleted):
+        # Full computation of the workbook with the delta applied
+        replaced = set(deleted) | set(upserted["Opportunity ID"])
+        raw_deals = pd.concat(
+            [
+                self.raw_deals[~self.raw_deals["Opportunity ID"].isin(replaced)],
+                upserted,
+            ],
+            ignore_index=True,
+        )
+        return calculate_compensation(raw_deals, self.raw_aes.copy(), EXCEPTIONS)
+
+    def assert_same_data(self, expected, actual):
+        for expected_frame, actual_frame, key in zip(
+            expected, actual, ["Opportunity_ID", "AE"]
+        ):
+            pd.testing.assert_frame_equal(
+                expected_frame.sort_values(key).reset_index(drop=True),
+                actual_frame[expected_frame.columns]
+                .sort_values(key)
+                .reset_index(drop=True),
+                check_dtype=False,
+                check_categorical=False,
+            )
+
+    def test_apply_deal_delta(self):
+        deal_data, ae_data, _, _ = apply_deal_delta(
+            self.deal_data,
+            self.ae_data,
+            EXCEPTIONS,
+            upserted=self.upserted,
+            deleted=self.deleted,
+        )
+        expected = self.recompute(self.upserted, self.deleted)
+        self.assert_same_data(expected, (deal_data, ae_data))
+
+        # The delta unlocked an accelerator tier and a new payment month
+        self.assertEqual(accelerator_multiplier(self.ae_data, self.accelerated_ae), 0)
+        self.assertGreater(accelerator_multiplier(ae_data, self.accelerated_ae), 0)
+        new_deal = deal_data[deal_data["Opportunity_ID"] == "NEW-0000001"].iloc[0]
+        months = self.deal_data.loc[
+            self.deal_data["AE"] == new_deal["AE"], "Payment_Date"
+        ].dt.to_period("M")
+        self.assertNotIn(new_deal["Payment_Date"].to_period("M"), set(months))
+
+    def test_replay_delta_log(self):
+        deal_data, ae_data = compact_frames(self.deal_data, self.ae_data)
+        base = DatasetSnapshot(
+            version="base",
+            deal_data=deal_data,
+            ae_data=ae_data,
+            cube=build_compensation_cube(deal_data, ae_data),
+            exceptions=EXCEPTIONS,
+        )
+        deltas = [
+            {"upserted": to_records(self.upserted.iloc[:2])},
+            {"deleted": self.deleted},
+            {"upserted": to_records(self.upserted.iloc[2:])},
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dealDeltas.jsonl")
+            with locked_delta_log(path) as log:
+                for delta in deltas[:2]:
+                    append_delta(log, delta)
+            partial = replay_deltas(base, path)
+            with locked_delta_log(path) as log:
+                append_delta(log, deltas[2])
+
+            # Catching up applies the new delta only, like a full replay
+            replayed = replay_deltas(partial, path)
+            full = replay_deltas(base, path)
+            self.assertEqual(replayed.version, full.version)
+            self.assertEqual(replayed.delta_offset, os.path.getsize(path))
+            self.assertEqual(full.delta_offset, os.path.getsize(path))
+            self.assertIs(replay_deltas(full, path).version, full.version)
+
+        expected = compact_frames(*self.recompute(self.upserted, self.deleted))
+        self.assert_same_data(expected, (replayed.deal_data, replayed.ae_data))
+        cube = build_compensation_cube(*expected)
+        self.assertEqual(list(replayed.cube.aes), list(cube.aes))
+        self.assertEqual(list(replayed.cube.years), list(cube.years))
+        np.testing.assert_allclose(replayed.cube.values, cube.values)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import logging
+import os
+
+from dash import DiskcacheManager
+from utils.metrics import instrument, record_cache_lookup, stage
+
+logger = logging.getLogger(__name__)
+
+# Directory of the disk cache holding the background jobs and their results
+BACKGROUND_CACHE_DIR = os.environ.get(
+    "COMPENSATION_BACKGROUND_CACHE_DIR", "./data/.cache/callbacks"
+)
+
+# Background callbacks run in their own process when enabled ("1"); each
+# result then takes at least one poll of the browser, so they are off by default
+BACKGROUND_CALLBACKS = os.environ.get("COMPENSATION_BACKGROUND_CALLBACKS", "0") == "1"
+
+# Milliseconds between two polls of a background callback by the browser
+BACKGROUND_POLL_INTERVAL = 250
+
+# Seconds a cached callback result is kept
+BACKGROUND_RESULT_EXPIRE = 3600
+
+# Seconds after which the dispatch lock of a crashed web worker is released
+DISPATCH_LOCK_EXPIRE = 30
+
+
+class BackgroundManager(DiskcacheManager):
+    """
+    DiskcacheManager that only starts a process for results not cached yet.
+
+    Identical queries (same cache key) dispatched by any web worker while a
+    process computes them share that process: the dispatch runs under a
+    disk lock of the key, and a shared process is only terminated once
+    every request waiting on it has been answered or cancelled.
+
+    The dispatch and the polls run in the web worker and are recorded in the
+    metrics under the callback's name ("<name>:poll" for the polls).
+
+    Parameters:
+    - cache: diskcache.Cache holding the jobs' results and progress.
+    - cache_by: Optional list of callables without arguments whose results
+      are part of the result cache key.
+    - expire: Seconds a cached result is kept.
+    - name: Name of the callback in the exported metrics.
+    """
+
+    def __init__(self, cache, cache_by=None, expire=None, name="background"):
+        super().__init__(cache, cache_by=cache_by, expire=expire)
+        self.name = name
+
+    def call_job_fn(self, key, job_fn, args, context):
+        return instrument(self.name)(self._dispatch)(key, job_fn, args, context)
+
+    def get_result(self, key, job):
+        return instrument(f"{self.name}:poll")(super().get_result)(key, job)
+
+    def terminate_job(self, job):
+        # Keep a shared process running for the requests still waiting on it
+        job = int(job)
+        if job and self.handle.decr(self._make_waiters_key(job), default=1) > 0:
+            return
+        super().terminate_job(job)
+
+    def _make_job_key(self, key):
+        return f"{key}-job"
+
+    def _make_waiters_key(self, job):
+        return f"job-{job}-waiters"
+
+    def _dispatch(self, key, job_fn, args, context):
+        import diskcache
+
+        with stage("dispatch"), diskcache.Lock(
+            self.handle, f"{key}-dispatch", expire=DISPATCH_LOCK_EXPIRE
+        ):
+            if self.result_ready(key):
+                # No process to wait for: the first poll returns the result
+                record_cache_lookup("background_result", True)
+                return 0
+
+            job = self.handle.get(self._make_job_key(key))
+            shared = job is not None and self.job_running(job)
+            record_cache_lookup("background_result", shared)
+            if shared:
+                self.handle.incr(self._make_waiters_key(job))
+                return job
+
+            job = super().call_job_fn(key, job_fn, args, context)
+            self.handle.set(self._make_job_key(key), job, expire=self.expire)
+            self.handle.set(self._make_waiters_key(job), 1, expire=self.expire)
+            return job
+
+
+def create_background_manager(
+    cache_by=None, cache_dir=BACKGROUND_CACHE_DIR, name="background"
+):
+    """
+    Create the manager running Dash background callbacks in worker processes.
+
+    Parameters:
+    - cache_by: Optional list of callables without arguments whose results
+      are part of the result cache key (e.g. the dataset version).
+    - cache_dir: Directory of the disk cache shared by the web workers.
+    - name: Name of the callback in the exported metrics.
+
+    Returns:
+    - manager: A BackgroundManager, or None when background callbacks are
+      disabled or diskcache is not installed.
+    """
+    if not BACKGROUND_CALLBACKS:
+        return None
+    try:
+        import diskcache
+    except ImportError:
+        logger.warning(
+            "diskcache is not installed, heavy callbacks run in the request thread"
+        )
+        return None
+
+    return BackgroundManager(
+        diskcache.Cache(cache_dir),
+        cache_by=cache_by,
+        expire=BACKGROUND_RESULT_EXPIRE,
+        name=name,
+    )
@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+
+from utils.metrics import record_cache_lookup
+from utils.singleflight import SingleFlight
+
+
+class LRUCache:
+    """
+    Thread-safe, bounded memo table with least-recently-used eviction.
+
+    Values are shared between callers, so they must be treated as read-only.
+    Concurrent misses of the same key wait for a single computation.
+
+    Parameters:
+    - maxsize: Maximum number of entries kept before evicting the oldest one.
+    - name: Optional name under which lookups are counted in the metrics.
+    """
+
+    def __init__(self, maxsize=128, name=None):
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the value stored under key, computing and storing it on a miss.
+
+        Parameters:
+        - key: Hashable key of the value.
+        - compute: Callable without arguments producing the value.
+
+        Returns:
+        - value: The cached or freshly computed value.
+        """
+        with self._lock:
+            hit = key in self._entries
+            if hit:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                value = self._entries[key]
+            else:
+                self.misses += 1
+        if self.name:
+            record_cache_lookup(self.name, hit)
+        if hit:
+            return value
+
+        # Compute outside the lock so other keys are not blocked, once for
+        # the callers missing the same key at the same time
+        return self._flight.do(key, lambda: self._compute(key, compute))
+
+    def _compute(self, key, compute):
+        # A computation of the key may have finished since the lookup
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """
+        Report the cache statistics.
+
+        Returns:
+        - info: Dictionary with hits, misses, size and maxsize.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
@@ -0,0 +1,450 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds (bytes) of the payload size histogram buckets
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+# Adds a Server-Timing header with the stage timings to callback responses
+TIMING_HEADER = os.environ.get("COMPENSATION_TIMING_HEADER", "") == "1"
+
+# Directory through which the processes of a preforking server share their
+# metrics, so that /metrics reports all of them (see gunicorn.conf.py)
+METRICS_DIR = os.environ.get("COMPENSATION_METRICS_DIR")
+
+# Seconds between two writes of a process's metrics to METRICS_DIR
+METRICS_WRITE_INTERVAL = 1.0
+
+# Name of the instrumented callback or page render currently running
+current_callback = contextvars.ContextVar("current_callback", default=None)
+
+_lock = threading.Lock()
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """
+    Prometheus histogram with one series per combination of label values.
+
+    Parameters:
+    - name: Metric name.
+    - help_text: Description exported with the metric.
+    - labelnames: Names of the labels.
+    - buckets: Increasing upper bounds of the buckets.
+    """
+
+    def __init__(self, name, help_text, labelnames, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        """
+        Record one observation.
+
+        Parameters:
+        - labels: Tuple of label values, in the order of labelnames.
+        - value: Observed value.
+        """
+        with _lock:
+            series = self._series.setdefault(
+                labels, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            )
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][position] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def collect(self):
+        """
+        Copy the series recorded so far.
+
+        Returns:
+        - series: Dictionary of label values -> buckets, sum and count.
+        """
+        with _lock:
+            return {
+                labels: dict(values, buckets=list(values["buckets"]))
+                for labels, values in self._series.items()
+            }
+
+    def combine(self, first, second):
+        """Add up the values of one series recorded by two processes."""
+        return {
+            "buckets": [a + b for a, b in zip(first["buckets"], second["buckets"])],
+            "sum": first["sum"] + second["sum"],
+            "count": first["count"] + second["count"],
+        }
+
+    def render(self, series=None):
+        """
+        Render the histogram in the Prometheus text format.
+
+        Parameters:
+        - series: Optional series to render instead of the recorded ones
+          (see collect).
+        """
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        if series is None:
+            series = self.collect()
+        for labels, values in sorted(series.items()):
+            names = self.labelnames + ("le",)
+            for bound, count in zip(self.buckets, values["buckets"]):
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {count}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} "
+                f"{values['count']}"
+            )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {values['sum']}")
+            lines.append(f"{self.name}_count{label_text} {values['count']}")
+        return lines
+
+
+class Counter:
+    """
+    Prometheus counter with one series per combination of label values.
+
+    Parameters:
+    - name: Metric name.
+    - help_text: Description exported with the metric.
+    - labelnames: Names of the labels.
+    """
+
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._series = {}
+
+    def inc(self, labels, amount=1):
+        """
+        Increase the counter.
+
+        Parameters:
+        - labels: Tuple of label values, in the order of labelnames.
+        - amount: Increment.
+        """
+        with _lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def collect(self):
+        """
+        Copy the series recorded so far.
+
+        Returns:
+        - series: Dictionary of label values -> count.
+        """
+        with _lock:
+            return dict(self._series)
+
+    def combine(self, first, second):
+        """Add up the values of one series recorded by two processes."""
+        return first + second
+
+    def render(self, series=None):
+        """
+        Render the counter in the Prometheus text format.
+
+        Parameters:
+        - series: Optional series to render instead of the recorded ones
+          (see collect).
+        """
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+        ]
+        if series is None:
+            series = self.collect()
+        for labels, value in sorted(series.items()):
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            )
+        return lines
+
+
+CALLBACK_SECONDS = Histogram(
+    "dash_callback_duration_seconds",
+    "Wall time of Dash callbacks and page renders.",
+    ("callback",),
+    LATENCY_BUCKETS,
+)
+CALLBACK_ERRORS = Counter(
+    "dash_callback_errors_total",
+    "Dash callbacks and page renders that raised an exception.",
+    ("callback",),
+)
+STAGE_SECONDS = Histogram(
+    "dash_callback_stage_duration_seconds",
+    "Wall time of the stages (filter, groupby, merge, figure, ...) of a callback.",
+    ("callback", "stage"),
+    LATENCY_BUCKETS,
+)
+PAYLOAD_BYTES = Histogram(
+    "dash_callback_response_bytes",
+    "Size of the responses sent by Dash callbacks.",
+    ("callback",),
+    SIZE_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Lookups of the in-process memo caches by callback and result.",
+    ("callback", "cache", "result"),
+)
+
+METRICS = [
+    CALLBACK_SECONDS,
+    CALLBACK_ERRORS,
+    STAGE_SECONDS,
+    PAYLOAD_BYTES,
+    CACHE_LOOKUPS,
+]
+
+
+def _record_request_timing(name, seconds):
+    # Stage timings of the current request, reported in the Server-Timing header
+    if has_request_context():
+        timings = g.setdefault("metric_timings", {})
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def instrument(name):
+    """
+    Decorate a callback or page builder to record its wall time and errors.
+
+    Parameters:
+    - name: Name of the callback in the exported metrics.
+
+    Returns:
+    - decorator: Decorator wrapping the function.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            token = current_callback.set(name)
+            if has_request_context():
+                g.metric_callback = name
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                CALLBACK_ERRORS.inc((name,))
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                CALLBACK_SECONDS.observe((name,), elapsed)
+                _record_request_timing("total", elapsed)
+                current_callback.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def stage(name):
+    """
+    Time one stage of the running callback (e.g. "filter", "merge", "figure").
+
+    Parameters:
+    - name: Name of the stage in the exported metrics.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe((current_callback.get() or "none", name), elapsed)
+        _record_request_timing(name, elapsed)
+
+
+def stream_stage(chunks, callback, name):
+    """
+    Time the production of a streamed response body as a stage of a callback.
+
+    The body of a streamed response is produced after the view returned, so
+    the stage is recorded once the stream ends. Only the time spent producing
+    the chunks counts, not the time spent sending them.
+
+    Parameters:
+    - chunks: Iterable of the response chunks.
+    - callback: Name of the instrumented view the stage belongs to.
+    - name: Name of the stage in the exported metrics.
+
+    Returns:
+    - chunks: Generator yielding the same chunks.
+    """
+    elapsed = 0.0
+    iterator = iter(chunks)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield chunk
+    finally:
+        STAGE_SECONDS.observe((callback, name), elapsed)
+
+
+def record_cache_lookup(cache, hit):
+    """
+    Count a lookup of a memo cache against the running callback.
+
+    Parameters:
+    - cache: Name of the cache.
+    - hit: Whether the value was found in the cache.
+    """
+    CACHE_LOOKUPS.inc(
+        (current_callback.get() or "none", cache, "hit" if hit else "miss")
+    )
+
+
+def write_metrics(directory):
+    """
+    Write the metrics recorded by this process to a shared directory.
+
+    Parameters:
+    - directory: Directory holding one <pid>.json file per process.
+    """
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(
+            {
+                metric.name: [
+                    [list(labels), values]
+                    for labels, values in metric.collect().items()
+                ]
+                for metric in METRICS
+            },
+            file,
+        )
+    os.replace(tmp_path, path)
+
+
+def _collect_processes(directory):
+    # Add the metrics written by the other processes to this process's ones
+    collected = {metric.name: metric.collect() for metric in METRICS}
+    own_file = f"{os.getpid()}.json"
+    for entry in os.listdir(directory):
+        if not entry.endswith(".json") or entry == own_file:
+            continue
+        try:
+            with open(os.path.join(directory, entry)) as file:
+                written = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for metric in METRICS:
+            series = collected[metric.name]
+            for labels, values in written.get(metric.name, []):
+                labels = tuple(labels)
+                series[labels] = (
+                    metric.combine(series[labels], values)
+                    if labels in series
+                    else values
+                )
+    return collected
+
+
+def render_metrics(directory=None):
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Parameters:
+    - directory: Optional directory written by the other processes of the
+      server (see write_metrics), whose metrics are added to this process's.
+
+    Returns:
+    - text: The metrics, one sample per line.
+    """
+    collected = _collect_processes(directory) if directory else {}
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render(collected.get(metric.name)))
+    return "\n".join(lines) + "\n"
+
+
+def register_metrics_routes(app, timing_header=TIMING_HEADER, directory=METRICS_DIR):
+    """
+    Expose the metrics at /metrics and record the size of callback responses.
+
+    Parameters:
+    - app: Dash app to instrument.
+    - timing_header: Whether to add a Server-Timing header with the stage
+      timings to the responses of instrumented callbacks.
+    - directory: Optional directory through which the processes of a
+      preforking server share their metrics; every process then writes its
+      metrics there each METRICS_WRITE_INTERVAL and /metrics reports the
+      sum over all of them.
+    """
+    server = app.server
+    writer = {"pid": None}
+    writer_lock = threading.Lock()
+
+    def write_periodically():
+        while True:
+            time.sleep(METRICS_WRITE_INTERVAL)
+            write_metrics(directory)
+
+    @server.before_request
+    def start_metrics_writer():
+        # Threads do not survive the fork of a preforked worker, so every
+        # serving process starts its own writer
+        if not directory or writer["pid"] == os.getpid():
+            return
+        with writer_lock:
+            if writer["pid"] != os.getpid():
+                writer["pid"] = os.getpid()
+                os.makedirs(directory, exist_ok=True)
+                threading.Thread(
+                    target=write_periodically, name="metrics-writer", daemon=True
+                ).start()
+
+    @server.after_request
+    def record_response(response):
+        name = g.get("metric_callback")
+        if name is None:
+            return response
+        if response.content_length is not None:
+            PAYLOAD_BYTES.observe((name,), response.content_length)
+        if timing_header:
+            response.headers["Server-Timing"] = ", ".join(
+                f"{stage_name};dur={seconds * 1000:.1f}"
+                for stage_name, seconds in g.get("metric_timings", {}).items()
+            )
+        return response
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(render_metrics(directory), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,142 @@
+import functools
+import threading
+
+from utils.metrics import record_cache_lookup
+
+
+class _Call:
+    # Computation in flight, awaited by the callers sharing it
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread-safe table coalescing concurrent computations of the same key.
+
+    The first caller of a key computes the value, while concurrent callers of
+    that key wait for it and share its result (or its exception). Nothing is
+    kept once the computation finishes; combine it with a cache for that.
+
+    Parameters:
+    - name: Optional name under which shared and computed calls are counted
+      in the metrics (as cache hits and misses).
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute):
+        """
+        Compute the value of key, or wait for the computation already running.
+
+        Parameters:
+        - key: Hashable key of the computation.
+        - compute: Callable without arguments producing the value.
+
+        Returns:
+        - value: The value computed by this or a concurrent caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            shared = call is not None
+            if not shared:
+                call = self._calls[key] = _Call()
+        if self.name:
+            record_cache_lookup(self.name, shared)
+
+        if shared:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = compute()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def in_flight(self):
+        """
+        Report the number of computations running.
+
+        Returns:
+        - count: Number of keys being computed.
+        """
+        with self._lock:
+            return len(self._calls)
+
+
+def freeze(value):
+    """
+    Turn a function argument into a hashable key.
+
+    Lists, tuples and dicts are frozen recursively. Other unhashable values
+    (e.g. DataFrames) are identified by their identity, which is stable while
+    the computation using them is in flight.
+
+    Parameters:
+    - value: Argument to freeze.
+
+    Returns:
+    - key: Hashable representation of the value.
+    """
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(freeze(item) for item in value))
+    if isinstance(value, dict):
+        return (
+            "dict",
+            tuple(
+                sorted(((key, freeze(item)) for key, item in value.items()), key=repr)
+            ),
+        )
+    try:
+        hash(value)
+    except TypeError:
+        return ("id", type(value).__name__, id(value))
+    return value
+
+
+def single_flight(name=None, version=None):
+    """
+    Decorate a function so that concurrent identical calls are computed once.
+
+    Calls are keyed on the dataset version, the function and its arguments;
+    each decorated function has its own table, available as its flight
+    attribute.
+
+    Parameters:
+    - name: Optional name under which the calls are counted in the metrics.
+    - version: Optional callable without arguments returning the version of
+      the data the function reads (e.g. the dataset snapshot version).
+
+    Returns:
+    - decorator: Decorator wrapping the function.
+    """
+
+    def decorator(function):
+        flight = SingleFlight(name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (
+                version() if version else None,
+                freeze(args),
+                freeze(kwargs),
+            )
+            return flight.do(key, lambda: function(*args, **kwargs))
+
+        wrapper.flight = flight
+        return wrapper
+
+    return decorator